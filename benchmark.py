@@ -0,0 +1,304 @@
+# Benchmark suite for database operations and the GUI query path
+# Builds synthetic movies databases and measures ingest, lookups, sample queries and thumbnails
+#
+# Usage:
+#   python benchmark.py generate [--sizes 1000 10000]
+#   python benchmark.py run [--sizes 1000 10000]
+#   python benchmark.py importtime
+
+# Import libraries
+import argparse
+import logging.config
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import io
+from datetime import datetime, timedelta
+from typing import Callable, Iterator
+
+# Configure logging
+logging.config.fileConfig('logging.ini')  # Load config file before import of other modules
+
+# Import functions and classes from other modules of the app
+from db_operations import initialize_database, create_connection, movie_exists, insert_movie, execute_query
+from config_loader import Config, LargeStrings
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+# Words used to build realistic Lithuanian titles and descriptions
+TITLE_WORDS: list[str] = [
+    "Vasaros", "naktis", "Žydrasis", "kaftanas", "Tėvas", "Sūnus", "Kelionė", "į", "Vilnių", "Miestas",
+    "be", "vardo", "Paskutinė", "diena", "Laiptai", "dangų", "Šeimos", "paslaptis", "Rudens", "sonata",
+    "Jūros", "vėjas", "Senasis", "malūnas", "Ąžuolų", "giraitė", "Žalgiris", "Ugnies", "ženklas", "Tiltas",
+    "Namai", "kalno", "Mergaitė", "ir", "vilkas", "Baltijos", "kelias", "Gintarinė", "pilis", "Kaimo",
+]
+DESCRIPTION_WORDS: list[str] = [
+    "filmas", "pasakoja", "apie", "jauną", "moterį", "kuri", "grįžta", "į", "gimtąjį", "kaimą", "po",
+    "ilgų", "metų", "užsienyje", "ten", "ji", "susiduria", "su", "praeities", "paslaptimis", "ir",
+    "sena", "meile", "režisierius", "sukūrė", "jautrią", "istoriją", "kurioje", "vaidina", "žinomi",
+    "Lietuvos", "aktoriai", "kinas", "sovietmečio", "laikų", "šeima", "draugystė", "karas", "miestas",
+    "vasara", "žiema", "kelionė", "laisvė", "tiesa", "likimas", "ūkininkas", "mokytojas", "gydytoja",
+]
+
+# Modules that must not be loaded by import of the app module, they are imported on first use
+IMPORT_FORBIDDEN: dict[str, list[str]] = {
+    "main": ["gui", "scraping", "file_operations", "tkinter", "PIL", "selenium", "requests", "webdriver_manager"],
+    "gui": ["scraping", "file_operations", "PIL", "selenium", "requests", "webdriver_manager"],
+}
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """Return latency percentiles in milliseconds for the list of samples in seconds."""
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {"p50": value, "p90": value, "p99": value, "max": value}
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {"p50": cuts[49] * 1000, "p90": cuts[89] * 1000, "p99": cuts[98] * 1000, "max": max(samples) * 1000}
+
+
+def measure(func: Callable, calls: list[tuple]) -> dict[str, float]:
+    """Call the function with each argument tuple and return latency percentiles and peak memory."""
+    samples = []
+    tracemalloc.start()
+    for args in calls:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = percentiles(samples)
+    result["calls"] = len(samples)
+    result["peak_mb"] = peak / 1024 / 1024
+    return result
+
+
+def database_path(size: int) -> str:
+    """Return the path of the synthetic database of given size."""
+    return os.path.join(config["benchmark"]["directory"], f"movies_{size}.db")
+
+
+def generate_images() -> list[bytes]:
+    """Create a pool of JPEG cover images of realistic size."""
+    from PIL import Image
+
+    width, height = config["benchmark"]["image_size"]
+    images = []
+    for _ in range(config["benchmark"]["image_pool"]):
+        # Upscaled noise gives smooth colour areas that compress like real covers
+        noise = Image.frombytes("RGB", (width // 8, height // 8), os.urandom(width // 8 * height // 8 * 3))
+        img = noise.resize((width, height), Image.Resampling.BICUBIC)
+        with io.BytesIO() as output:
+            img.save(output, format="JPEG", quality=85)
+            images.append(output.getvalue())
+    return images
+
+
+def generate_movies(size: int, images: list[bytes], rnd: random.Random) -> Iterator[tuple]:
+    """Yield synthetic movie tuples in the format accepted by insert_movie."""
+    genres = LargeStrings.list_of_genres_mediateka
+    start_date = datetime(2024, 1, 1)
+    for i in range(size):
+        title = " ".join(rnd.sample(TITLE_WORDS, rnd.randint(1, 4)))
+        description = " ".join(rnd.choices(DESCRIPTION_WORDS, k=rnd.randint(30, 120)))
+        genre = rnd.choice(genres)
+        if rnd.random() < 0.3:
+            description += f" {genre}."
+        # About one percent of the urls are duplicated, as happens after repeated scrapes
+        url_id = rnd.randrange(i) if i and rnd.random() < 0.01 else i
+        url = f"https://epika.lrt.lt/filmai/{title.lower().replace(' ', '-')}-{url_id}"
+        found = (start_date + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")
+        yield (title, images[i % len(images)], description, rnd.randint(1930, 2024), rnd.randint(5, 180), genre,
+               url, found, None, None, rnd.randint(0, 50000), False)
+
+
+def generate_database(size: int) -> None:
+    """Build the synthetic database of given size, replacing the previous one."""
+    path = database_path(size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    initialize_database(path)
+
+    logger.info("Generating %s movies into '%s'", size, path)
+    rnd = random.Random(size)
+    sql = '''INSERT INTO movies(title, image, description, release_year, duration, genre, url, date_of_first_finding,
+    date_of_disappearance, related_persons, views_count, is_memorable) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)'''
+    conn = create_connection(path)
+    with conn:
+        conn.executemany(sql, generate_movies(size, generate_images(), rnd))
+    conn.close()
+    logger.info("Database '%s' generated: %.1f MB", path, os.path.getsize(path) / 1024 / 1024)
+
+
+def bench_ingest(size: int) -> dict[str, float]:
+    """Measure insert_movie latency while appending rows one by one to a copy of the database."""
+    rows = list(generate_movies(config["benchmark"]["ingest_rows"], generate_images(), random.Random(0)))
+    path = database_path(size) + ".ingest"
+    shutil.copyfile(database_path(size), path)
+    conn = create_connection(path)
+    try:
+        return measure(lambda movie: insert_movie(conn, movie), [(movie,) for movie in rows])
+    finally:
+        conn.close()
+        os.remove(path)
+
+
+def bench_movie_exists(size: int) -> dict[str, float]:
+    """Measure movie_exists latency for a mix of known and unknown urls."""
+    conn = create_connection(database_path(size))
+    try:
+        urls = [row[0] for row in conn.execute("SELECT url FROM movies ORDER BY random() LIMIT ?",
+                                               (config["benchmark"]["lookups"] // 2,))]
+        urls += [f"https://epika.lrt.lt/filmai/unknown-{i}" for i in range(config["benchmark"]["lookups"] // 2)]
+        return measure(lambda url: movie_exists(conn, url), [(url,) for url in urls])
+    finally:
+        conn.close()
+
+
+def bench_queries(size: int) -> dict[str, dict[str, float]]:
+    """Measure execute_query for each sample query of the GUI."""
+    databases = [database_path(size)]
+    repeats = config["benchmark"]["query_repeats"]
+    return {query: measure(execute_query, [(query, databases)] * repeats) for query in LargeStrings.sample_queries}
+
+
+def bench_thumbnails(size: int) -> dict[str, float]:
+    """Measure thumbnail generation as done for each row of the GUI results."""
+    import gui
+
+    conn = create_connection(database_path(size))
+    try:
+        blobs = [row[0] for row in conn.execute("SELECT image FROM movies LIMIT ?",
+                                                (config["benchmark"]["thumbnails"],))]
+    finally:
+        conn.close()
+
+    # PhotoImage needs a Tk interpreter, decode and resize only if no display is available
+    try:
+        root = gui.tk.Tk()
+        root.withdraw()
+    except gui.tk.TclError:
+        logger.info("No display available, measuring decode and resize without PhotoImage.")
+        return measure(gui.resize_image_blob, [(blob,) for blob in blobs])
+    try:
+        return measure(gui.get_thumbnail, [(blob,) for blob in blobs])
+    finally:
+        gui.image_references.clear()
+        root.destroy()
+
+
+def bench_column_store(size: int) -> dict[str, float]:
+    """Measure filter mask evaluation of the in-memory column store for random year and duration ranges."""
+    from column_store import ColumnStore, numpy_available
+
+    if not numpy_available():
+        logger.info("NumPy is not installed, skipping column store benchmark.")
+        return {}
+    store = ColumnStore({"benchmark": database_path(size)})
+    try:
+        rng = random.Random(1)
+        filters = [((year, year + rng.randint(0, 30)), (duration, duration + rng.randint(10, 90)))
+                   for year, duration in ((rng.randint(1950, 2020), rng.randint(5, 150))
+                                          for _ in range(config["benchmark"]["lookups"]))]
+        return measure(lambda years, durations: store.mask(release_years=years, durations=durations), filters)
+    finally:
+        store.close()
+
+
+def print_result(name: str, result: dict[str, float]) -> None:
+    """Print one line of the benchmark report."""
+    print(f"{name[:70]:<70} {result['calls']:>6} {result['p50']:>10.2f} {result['p90']:>10.2f} "
+          f"{result['p99']:>10.2f} {result['max']:>10.2f} {result['peak_mb']:>9.1f}")
+
+
+def run_benchmarks(size: int) -> None:
+    """Run all benchmarks against the synthetic database of given size and print the report."""
+    if not os.path.exists(database_path(size)):
+        generate_database(size)
+    else:
+        initialize_database(database_path(size))  # Upgrade databases generated with older schema
+
+    print(f"\nDatabase size: {size} rows, {os.path.getsize(database_path(size)) / 1024 / 1024:.1f} MB")
+    print(f"{'Benchmark':<70} {'calls':>6} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'max ms':>10} "
+          f"{'peak MB':>9}")
+    print_result("insert_movie", bench_ingest(size))
+    print_result("movie_exists", bench_movie_exists(size))
+    for query, result in bench_queries(size).items():
+        print_result(f"execute_query: {query}", result)
+    print_result("get_thumbnail", bench_thumbnails(size))
+    result = bench_column_store(size)
+    if result:
+        print_result("column_store_filter", result)
+
+
+def measure_import_time(module: str) -> list[tuple[int, int, str]]:
+    """Import the module in a new interpreter with '-X importtime' and return (self us, cumulative us, name)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((int(self_us), int(cumulative_us), name.strip()))
+    return entries
+
+
+def run_import_benchmark() -> bool:
+    """Report import time of app modules and check it against the budget. Returns False on regression."""
+    ok = True
+    for module, forbidden in IMPORT_FORBIDDEN.items():
+        # The best of several runs filters out the noise of a cold file system cache
+        runs = [measure_import_time(module) for _ in range(config["benchmark"]["import_repeats"])]
+        entries = min(runs, key=lambda run: next(cum for _, cum, name in run if name == module))
+        total_ms = next(cum for _, cum, name in entries if name == module) / 1000
+        budget_ms = config["benchmark"]["import_budget_ms"][module]
+
+        print(f"\nimport {module}: {total_ms:.1f} ms (budget {budget_ms} ms)")
+        print(f"{'Module':<60} {'self ms':>10} {'cumul. ms':>10}")
+        for self_us, cumulative_us, name in sorted(entries, key=lambda entry: entry[1], reverse=True)[:15]:
+            print(f"{name[:60]:<60} {self_us / 1000:>10.1f} {cumulative_us / 1000:>10.1f}")
+
+        loaded = {name.split('.')[0] for _, _, name in entries}
+        for name in forbidden:
+            if name in loaded:
+                logger.error("Module '%s' is loaded on import of '%s'", name, module)
+                ok = False
+        if total_ms > budget_ms:
+            logger.error("Import of '%s' takes %.1f ms, budget is %s ms", module, total_ms, budget_ms)
+            ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark database operations and the GUI query path")
+    parser.add_argument('command', choices=['generate', 'run', 'importtime'],
+                        help='Generate databases, run benchmarks or report import time of app modules')
+    parser.add_argument('--sizes', nargs='+', type=int, default=config["benchmark"]["sizes"],
+                        help='Number of rows of synthetic databases')
+    args = parser.parse_args()
+
+    # Connection messages of every measured call would flood the report
+    logging.getLogger('db_operations').setLevel(logging.WARNING)
+
+    if args.command == 'importtime':
+        sys.exit(0 if run_import_benchmark() else 1)
+
+    for size in args.sizes:
+        if args.command == 'generate':
+            generate_database(size)
+        else:
+            run_benchmarks(size)
+
+
+if __name__ == "__main__":
+    main()
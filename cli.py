@@ -0,0 +1,149 @@
+# Headless commands of the app, they do not load Tkinter, PIL or Selenium unless the command needs them
+
+# Import libraries
+import csv
+import json
+import logging
+import sys
+from typing import Optional, TextIO
+
+# Import functions and classes from other modules of the app
+from db_operations import stream_query, create_connection
+from cover_index import load_cover_index, similar_covers, duplicate_covers
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+# Movie ids looked up in one query
+TITLE_CHUNK = 500
+
+
+def run_scrape(site: str, phase: str) -> None:
+    """Perform shallow, deep or both scrapes of the site without GUI."""
+    from scraping import WebDriverContext
+    from file_operations import shallow_scrape_wrapper, deep_scrape_wrapper
+
+    with WebDriverContext() as driver:
+        if phase in ('shallow', 'all'):
+            shallow_scrape_wrapper(driver, config["data"][site], site)
+        if phase in ('deep', 'all'):
+            deep_scrape_wrapper(driver, config["data"][site], site)
+
+
+def run_refresh(site: str) -> None:
+    """Refresh the database of the site: mark disappeared and returned movies and deep scrape new ones."""
+    from scraping import WebDriverContext
+    from file_operations import refresh_wrapper
+
+    with WebDriverContext() as driver:
+        refresh_wrapper(driver, config["data"][site], site)
+
+
+def run_crawl(sites: list[str], workers: int) -> None:
+    """Deep scrape pages queued in the crawl frontier for the sites, interleaving them across workers."""
+    from file_operations import crawl_wrapper
+
+    crawl_wrapper(sites, workers)
+
+
+def _convert_rows(columns: list[str], rows: list[tuple], blobs: str,
+                  blob_columns: set[int]) -> tuple[list[str], list[list]]:
+    """Hex-encode BLOB values or drop BLOB columns from the chunk of rows."""
+    if blobs == 'hex':
+        return columns, [[value.hex() if isinstance(value, bytes) else value for value in row] for row in rows]
+    keep = [i for i in range(len(columns)) if i not in blob_columns]
+    return [columns[i] for i in keep], [[None if isinstance(row[i], bytes) else row[i] for i in keep] for row in rows]
+
+
+def export_query(query: str, databases: list[str], output_format: str, blobs: str, chunk_size: int,
+                 file: TextIO) -> int:
+    """Stream query results of all databases to the file as CSV or JSON lines. Returns number of rows written."""
+    writer = csv.writer(file) if output_format == 'csv' else None
+    header_written = False
+    blob_columns: Optional[set[int]] = None
+    counter = 0
+
+    for columns, rows in stream_query(query, databases, chunk_size):
+        # BLOB columns are detected in the first chunk of results
+        if blob_columns is None:
+            blob_columns = {i for i in range(len(columns)) if any(isinstance(row[i], bytes) for row in rows)}
+        names, values = _convert_rows(columns, rows, blobs, blob_columns)
+
+        if writer:
+            if not header_written:
+                writer.writerow(names)
+                header_written = True
+            writer.writerows(values)
+        else:
+            for row in values:
+                file.write(json.dumps(dict(zip(names, row)), ensure_ascii=False) + "\n")
+        counter += len(values)
+
+    return counter
+
+
+def run_query(query: str, databases: list[str], output_format: str, blobs: str, chunk_size: int,
+              output: Optional[str] = None) -> None:
+    """Execute a query on the databases and write the results to a file or standard output."""
+    if output:
+        with open(output, 'w', newline='', encoding='utf-8') as file:
+            counter = export_query(query, databases, output_format, blobs, chunk_size, file)
+    else:
+        counter = export_query(query, databases, output_format, blobs, chunk_size, sys.stdout)
+        sys.stdout.flush()
+    logger.info("%s rows exported", counter)
+
+
+def _movie_titles(site: str, movie_ids: set[int]) -> dict[int, tuple[str, str]]:
+    """Return title and url of the movies of the site by id."""
+    ids = sorted(movie_ids)
+    rows = []
+    conn = create_connection(config["data"][site], read_only=True)
+    try:
+        # Ids are bound in chunks, SQLite limits the number of query parameters
+        for start in range(0, len(ids), TITLE_CHUNK):
+            chunk = ids[start:start + TITLE_CHUNK]
+            rows += conn.execute(f"SELECT id, title, url FROM movies WHERE id IN ({','.join('?' * len(chunk))})",
+                                 chunk).fetchall()
+    finally:
+        conn.close()
+    return {movie_id: (title, url) for movie_id, title, url in rows}
+
+
+def run_similar_covers(site: Optional[str], movie_id: Optional[int], max_distance: int,
+                       output: Optional[str] = None) -> None:
+    """Write movies with a cover similar to the cover of the movie, or all pairs of similar covers, as CSV."""
+    tree, hashes = load_cover_index(['epika', 'mediateka'])
+    if movie_id is not None:
+        matches = similar_covers(tree, hashes, site, movie_id, max_distance)
+        header = ['distance', 'site', 'id', 'title', 'url']
+        keys = [(match_site, match_id) for _, match_site, match_id in matches]
+    else:
+        matches = duplicate_covers(tree, hashes, max_distance)
+        header = ['distance', 'site', 'id', 'title', 'url', 'other_site', 'other_id', 'other_title', 'other_url']
+        keys = [(pair[1], pair[2]) for pair in matches] + [(pair[3], pair[4]) for pair in matches]
+
+    titles = {}
+    for title_site in {key[0] for key in keys}:
+        for title_id, values in _movie_titles(title_site, {key[1] for key in keys if key[0] == title_site}).items():
+            titles[(title_site, title_id)] = values
+
+    file = open(output, 'w', newline='', encoding='utf-8') if output else sys.stdout
+    try:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        for match in matches:
+            row = [match[0]]
+            for i in range(1, len(match), 2):
+                row += [match[i], match[i + 1], *titles.get((match[i], match[i + 1]), (None, None))]
+            writer.writerow(row)
+    finally:
+        if output:
+            file.close()
+        else:
+            sys.stdout.flush()
+    logger.info("%s similar covers found", len(matches))
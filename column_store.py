@@ -0,0 +1,158 @@
+# In-memory column store of non-BLOB movie columns for interactive filtering in the GUI
+# NumPy is optional: without it the store is not available and the GUI hides the filters
+
+# Import libraries
+import logging
+import sqlite3
+from typing import Any, Optional
+
+# Import functions and classes from other modules of the app
+from db_operations import create_connection
+from metrics import metrics
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+# Code of missing release year and duration
+UNKNOWN = -1
+
+
+def numpy_available() -> bool:
+    """Check if NumPy can be imported."""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ColumnStore:
+    """Release year, duration, genre and site of movies of both databases kept in NumPy arrays.
+    Genre and site are dictionary encoded. Changes of databases are detected with PRAGMA data_version,
+    updates and deletes of loaded rows with the movie_changes counter."""
+
+    def __init__(self, databases: dict[str, str]):
+        import numpy
+        self.np = numpy
+        self.databases = databases
+        self.sites = list(databases)
+        self.genres: list[str] = []
+        self.genre_codes: dict[str, int] = {}
+        # Per database: read only connection, data_version, max loaded id and movie_changes counter at last sync
+        self.connections: dict[str, sqlite3.Connection] = {}
+        self.data_versions: dict[str, int] = {}
+        self.max_ids: dict[str, int] = {}
+        self.changes: dict[str, int] = {}
+        self.columns: dict[str, Any] = {}
+        self._reset_columns()
+        for site, database in databases.items():
+            conn = create_connection(database, read_only=True)
+            if conn:
+                self.connections[site] = conn
+                self._load(site, full=True)
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def _reset_columns(self, site: Optional[str] = None) -> None:
+        """Create empty columns, or drop rows of the site."""
+        np = self.np
+        if site is None:
+            self.columns = {"site": np.empty(0, np.uint8), "id": np.empty(0, np.int64),
+                            "release_year": np.empty(0, np.int16), "duration": np.empty(0, np.int16),
+                            "genre": np.empty(0, np.int32)}
+        else:
+            keep = self.columns["site"] != self.sites.index(site)
+            self.columns = {name: column[keep] for name, column in self.columns.items()}
+
+    def _encode_genre(self, genre: Optional[str]) -> int:
+        genre = genre or "unknown"
+        if genre not in self.genre_codes:
+            self.genre_codes[genre] = len(self.genres)
+            self.genres.append(genre)
+        return self.genre_codes[genre]
+
+    def _load(self, site: str, full: bool) -> None:
+        """Load all rows of the site, or append rows added since the last load."""
+        np = self.np
+        conn = self.connections[site]
+        with metrics.timer("column_store_load"):
+            # Snapshot of data_version and the change counter is taken in the same read transaction as the rows
+            conn.execute("BEGIN")
+            try:
+                data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+                changes = conn.execute("SELECT changes FROM movie_changes").fetchone()[0]
+                if not full and changes != self.changes[site]:
+                    # Existing rows were updated or deleted, appending new rows is not enough
+                    full = True
+                rows = conn.execute("SELECT id, release_year, duration, genre FROM movies WHERE id > ? ORDER BY id",
+                                    (0 if full else self.max_ids[site],)).fetchall()
+            finally:
+                conn.execute("COMMIT")
+
+            if full:
+                self._reset_columns(site)
+
+            code = self.sites.index(site)
+            new = {"site": np.full(len(rows), code, np.uint8),
+                   "id": np.fromiter((row[0] for row in rows), np.int64, len(rows)),
+                   "release_year": np.fromiter((UNKNOWN if row[1] is None else row[1] for row in rows), np.int16,
+                                               len(rows)),
+                   "duration": np.fromiter((UNKNOWN if row[2] is None else row[2] for row in rows), np.int16,
+                                           len(rows)),
+                   "genre": np.fromiter((self._encode_genre(row[3]) for row in rows), np.int32, len(rows))}
+            self.columns = {name: np.concatenate([column, new[name]]) for name, column in self.columns.items()}
+
+        self.data_versions[site] = data_version
+        self.changes[site] = changes
+        if rows:
+            self.max_ids[site] = rows[-1][0]
+        elif full:
+            self.max_ids[site] = 0
+        logger.info("Column store %s: %s rows of '%s' loaded, %s rows in total", "reloaded" if full else "updated",
+                    len(rows), site, len(self))
+
+    def refresh(self) -> bool:
+        """Load changes of databases modified by other connections since the last check. Returns True if any."""
+        changed = False
+        for site, conn in self.connections.items():
+            if conn.execute("PRAGMA data_version").fetchone()[0] != self.data_versions[site]:
+                self._load(site, full=False)
+                changed = True
+        return changed
+
+    def bounds(self, column: str) -> tuple[int, int]:
+        """Return minimum and maximum known value of release year or duration."""
+        values = self.columns[column][self.columns[column] != UNKNOWN]
+        return (int(values.min()), int(values.max())) if len(values) else (0, 0)
+
+    def mask(self, release_years: Optional[tuple[int, int]] = None, durations: Optional[tuple[int, int]] = None,
+             genre: Optional[str] = None, site: Optional[str] = None) -> Any:
+        """Evaluate the filters as a vectorized boolean mask. Range filters exclude movies with unknown values."""
+        with metrics.timer("column_store_filter"):
+            mask = self.np.ones(len(self), dtype=bool)
+            for column, bounds in (("release_year", release_years), ("duration", durations)):
+                if bounds is not None:
+                    values = self.columns[column]
+                    mask &= (values >= bounds[0]) & (values <= bounds[1])
+            if genre is not None:
+                mask &= self.columns["genre"] == self.genre_codes.get(genre, -1)
+            if site is not None:
+                mask &= self.columns["site"] == self.sites.index(site)
+        return mask
+
+    def ids(self, mask: Any, limit: int) -> dict[str, list[int]]:
+        """Return ids of the first rows selected by the mask, grouped by site."""
+        indexes = self.np.flatnonzero(mask)[:limit]
+        result: dict[str, list[int]] = {site: [] for site in self.sites}
+        for code, movie_id in zip(self.columns["site"][indexes].tolist(), self.columns["id"][indexes].tolist()):
+            result[self.sites[code]].append(movie_id)
+        return result
+
+    def close(self) -> None:
+        for conn in self.connections.values():
+            conn.close()
@@ -80,6 +80,17 @@ class LargeStrings:
         "SELECT * FROM movies WHERE title LIKE '%dokumentinis%';",
         "SELECT * FROM movies WHERE description LIKE '%dokumentinis%';",
         "SELECT * FROM movies;",
+        "SELECT * FROM movies WHERE date_of_disappearance IS NOT NULL;",
+        "SELECT m.*, (SELECT max(h.views) - min(h.views) FROM views_history h WHERE h.movie_id = m.id AND "
+        "h.recorded_at >= strftime('%s', 'now', '-7 days')) AS views_delta FROM movies m "
+        "WHERE views_delta > 0 ORDER BY views_delta DESC;",
+        "SELECT m.*, (SELECT max(h.views) - min(h.views) FROM views_history h WHERE h.movie_id = m.id AND "
+        "h.recorded_at >= strftime('%s', 'now', '-30 days')) AS views_delta FROM movies m "
+        "WHERE views_delta > 0 ORDER BY views_delta DESC LIMIT 50;",
+        "SELECT m.*, NULL AS views_delta, l.linked_title || ' (' || l.score || ') ' || l.linked_url AS link "
+        "FROM movies m JOIN movie_links l ON l.movie_id = m.id ORDER BY l.score DESC;",
         "SELECT * FROM movies WHERE url IN (SELECT url FROM movies GROUP BY url HAVING COUNT(url) > 1);",
+        "SELECT * FROM movies WHERE id IN (SELECT movie_id FROM cover_hashes WHERE dhash IN "
+        "(SELECT dhash FROM cover_hashes GROUP BY dhash HAVING COUNT(*) > 1));",
         "SELECT * FROM movies WHERE title IN (SELECT title FROM movies GROUP BY title HAVING COUNT(title) > 1);"
     ]
\ No newline at end of file
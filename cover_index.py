@@ -0,0 +1,105 @@
+# Import libraries
+import logging
+from typing import Iterator, Optional
+
+# Import functions and classes from other modules of the app
+from db_operations import create_connection
+from metrics import metrics
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+# Mask converting signed hashes stored in SQLite back to unsigned 64-bit values
+MASK_64 = (1 << 64) - 1
+
+
+def hamming_distance(hash_1: int, hash_2: int) -> int:
+    """Number of differing bits of two 64-bit hashes."""
+    return ((hash_1 ^ hash_2) & MASK_64).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree of cover hashes, finds hashes within a Hamming distance without scanning all of them"""
+
+    def __init__(self):
+        # Node: hash, keys of movies with this hash, children by distance
+        self.root: Optional[tuple[int, list, dict]] = None
+        self.size = 0
+
+    def add(self, value: int, key) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = (value, [key], {})
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, [key], {})
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> Iterator[tuple[int, object]]:
+        """Yield distance and key of every hash within max distance of the value."""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node_value, keys, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= max_distance:
+                for key in keys:
+                    yield distance, key
+            # Triangle inequality: only subtrees within the distance range can hold matches
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+
+
+def load_cover_index(sites: list[str]) -> tuple[BKTree, dict[tuple[str, int], int]]:
+    """Build a BK-tree of cover hashes of the sites. Keys are (site, movie id)."""
+    tree = BKTree()
+    hashes = {}
+    with metrics.timer("cover_index_build"):
+        for site in sites:
+            conn = create_connection(config["data"][site], read_only=True)
+            try:
+                for movie_id, dhash in conn.execute("SELECT movie_id, dhash FROM cover_hashes"):
+                    tree.add(dhash, (site, movie_id))
+                    hashes[(site, movie_id)] = dhash
+            finally:
+                conn.close()
+    logger.info("Cover index of %s hashes built", tree.size)
+    return tree, hashes
+
+
+def similar_covers(tree: BKTree, hashes: dict[tuple[str, int], int], site: str, movie_id: int,
+                   max_distance: int) -> list[tuple[int, str, int]]:
+    """Return distance, site and id of movies with a cover similar to the cover of the movie, closest first."""
+    if (site, movie_id) not in hashes:
+        logger.warning("Movie %s of '%s' has no cover hash", movie_id, site)
+        return []
+    with metrics.timer("cover_lookup"):
+        matches = [(distance, key[0], key[1]) for distance, key in tree.search(hashes[(site, movie_id)], max_distance)
+                   if key != (site, movie_id)]
+    return sorted(matches)
+
+
+def duplicate_covers(tree: BKTree, hashes: dict[tuple[str, int], int],
+                     max_distance: int) -> list[tuple[int, str, int, str, int]]:
+    """Return all pairs of movies with similar covers in the collection as distance, site, id, site, id."""
+    pairs = []
+    with metrics.timer("cover_lookup"):
+        for key, value in hashes.items():
+            for distance, other in tree.search(value, max_distance):
+                if key < other:
+                    pairs.append((distance,) + key + other)
+    return sorted(pairs)
@@ -1,12 +1,29 @@
 # Import libraries
+import os
+import pathlib
+import re
 import sqlite3
 import logging
-from typing import Optional
+import time
+from typing import Optional, Iterator
+
+# Import functions and classes from other modules of the app
+from metrics import metrics
+from config_loader import Config
 
 
 # Create a logger
 logger = logging.getLogger(__name__)
 
+# Logger of queries slower than the configured threshold, written to a separate file
+slow_query_logger = logging.getLogger("slow_queries")
+
+# Create an instance of the Config class
+config = Config().settings
+
+# Query plan steps reading a whole table, not an index. Plans name tables by their alias, e.g. 'SCAN m'
+FULL_SCAN_PATTERN = re.compile(r'\bSCAN (?:TABLE )?(?!CONSTANT ROW\b)\w+\b(?!.*\bINDEX\b)')
+
 
 def loggable(f):
     """A decorator that adds logging to a function."""
@@ -21,27 +38,110 @@ def loggable(f):
     return _inner
 
 
+# Version of the database schema, kept in 'PRAGMA user_version' so up to date databases skip schema checks
+SCHEMA_VERSION = 7
+
+
 def initialize_database(db_name: str) -> None:
-    """Create a database and its table if they do not exist."""
+    """Create a database and its tables if they do not exist."""
 
     conn = create_connection(db_name)
     if conn:
-        if not check_table_exists(conn, "movies"):
-            logger.info("Table 'movies' does not exist in '%s'. Creating new table.", str(db_name))
-            create_table(conn)
-        else:
-            logger.info("Table 'movies' exists in '%s'.", str(db_name))
-        conn.close()
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                logger.info("Database '%s' schema is up to date.", str(db_name))
+                return
+            upgrade_schema(conn, version)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        except sqlite3.Error:
+            logger.exception("Error initializing database '%s'.", str(db_name))
+        finally:
+            conn.close()
     else:
         logger.warning("Failed to create a database connection for '%s'.", str(db_name))
 
 
-def create_connection(db_file: str) -> Optional[sqlite3.Connection]:
+def maintain_database(db_name: str) -> None:
+    """Update planner statistics, free unused pages, check integrity and report the file size before and after."""
+
+    size_before = os.path.getsize(db_name)
+    conn = create_connection(db_name)
+    if not conn:
+        return
+    try:
+        with metrics.timer("maintenance"):
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # Incremental vacuum needs auto_vacuum set, which takes effect after a full VACUUM
+                logger.info("Converting '%s' to incremental auto vacuum.", str(db_name))
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            else:
+                free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                # executescript steps the pragma to completion, execute frees only one page
+                conn.executescript("PRAGMA incremental_vacuum;")
+                logger.info("%s free pages released from '%s'.", free_pages, str(db_name))
+            conn.commit()
+            problems = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+    except sqlite3.Error:
+        logger.exception("Error maintaining database '%s'.", str(db_name))
+        return
+    finally:
+        conn.close()
+
+    if problems == ["ok"]:
+        logger.info("Integrity check of '%s' passed.", str(db_name))
+    else:
+        logger.error("Integrity check of '%s' failed: %s", str(db_name), "; ".join(problems))
+    size_after = os.path.getsize(db_name)
+    logger.info("Database '%s' maintained: file %.1f MB -> %.1f MB", str(db_name), size_before / 1024 / 1024,
+                size_after / 1024 / 1024)
+
+
+def upgrade_schema(conn: sqlite3.Connection, version: int) -> None:
+    """Create tables missing in the database of given schema version."""
+
+    if version < 1:
+        # Takes effect only in a new empty database, existing ones are converted by 'maintain' command
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        if not check_table_exists(conn, "movies"):
+            logger.info("Table 'movies' does not exist. Creating new table.")
+            create_table(conn)
+        create_original_images_table(conn)
+    if version < 2:
+        # Set based refresh and movie_exists look movies up by url
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_movies_url ON movies(url)")
+    if version < 3:
+        create_views_history_table(conn)
+    if version < 4:
+        create_movie_links_table(conn)
+    if version < 5:
+        create_cover_hashes_table(conn)
+    if version < 6:
+        create_movie_stats(conn)
+        rebuild_movie_stats(conn)
+    if version < 7:
+        create_movie_changes(conn)
+
+
+def create_connection(db_file: str, read_only: bool = False) -> Optional[sqlite3.Connection]:
     """Create a database connection to the SQLite database specified by db_file.
-       If the database file does not exist, it will be created."""
+       If the database file does not exist, it will be created.
+       Read only connections are opened with the read profile: no writes, memory mapped I/O and a larger cache."""
 
     try:
-        conn = sqlite3.connect(db_file)
+        if read_only:
+            conn = sqlite3.connect(f"{pathlib.Path(db_file).resolve().as_uri()}?mode=ro", uri=True)
+            settings = config["database"]
+            conn.execute(f"PRAGMA mmap_size = {int(settings['mmap_size'])}")
+            conn.execute(f"PRAGMA cache_size = -{int(settings['cache_size_kb'])}")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn = sqlite3.connect(db_file)
         logger.info("Connected to SQLite database: '%s'.", str(db_file))
         return conn
     except sqlite3.Error:
@@ -89,6 +189,175 @@ def create_table(conn: sqlite3.Connection) -> None:
         logger.exception("Error checking table existence")
 
 
+def create_original_images_table(conn: sqlite3.Connection) -> None:
+    """Create a table for keeping original images replaced by normalized ones"""
+
+    sql_create_original_images_table = """ CREATE TABLE IF NOT EXISTS original_images (
+                                                movie_id INTEGER PRIMARY KEY,
+                                                image BLOB
+                                            ); """
+    try:
+        c = conn.cursor()
+        c.execute(sql_create_original_images_table)
+    except sqlite3.Error:
+        logger.exception("Error creating table 'original_images'")
+
+
+def create_views_history_table(conn: sqlite3.Connection) -> None:
+    """Create an append-only table of view counts, time is kept in Unix seconds to keep rows small"""
+
+    sql_create_views_history_table = """ CREATE TABLE IF NOT EXISTS views_history (
+                                              movie_id INTEGER NOT NULL,
+                                              recorded_at INTEGER NOT NULL,
+                                              views INTEGER NOT NULL,
+                                              PRIMARY KEY (movie_id, recorded_at)
+                                          ) WITHOUT ROWID; """
+    try:
+        c = conn.cursor()
+        c.execute(sql_create_views_history_table)
+    except sqlite3.Error:
+        logger.exception("Error creating table 'views_history'")
+
+
+def create_movie_links_table(conn: sqlite3.Connection) -> None:
+    """Create a table linking movies to near-duplicate movies of the other site"""
+
+    sql_create_movie_links_table = """ CREATE TABLE IF NOT EXISTS movie_links (
+                                            movie_id INTEGER NOT NULL,
+                                            linked_site TEXT NOT NULL,
+                                            linked_url TEXT NOT NULL,
+                                            linked_title TEXT,
+                                            score REAL NOT NULL,
+                                            linked_at TEXT NOT NULL,
+                                            PRIMARY KEY (movie_id, linked_url)
+                                        ) WITHOUT ROWID; """
+    try:
+        c = conn.cursor()
+        c.execute(sql_create_movie_links_table)
+    except sqlite3.Error:
+        logger.exception("Error creating table 'movie_links'")
+
+
+def create_cover_hashes_table(conn: sqlite3.Connection) -> None:
+    """Create a table of perceptual hashes of cover images, indexed for exact duplicate lookups"""
+
+    sql_create_cover_hashes_table = """ CREATE TABLE IF NOT EXISTS cover_hashes (
+                                             movie_id INTEGER PRIMARY KEY,
+                                             dhash INTEGER NOT NULL
+                                         ); """
+    try:
+        c = conn.cursor()
+        c.execute(sql_create_cover_hashes_table)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_cover_hashes_dhash ON cover_hashes(dhash)")
+    except sqlite3.Error:
+        logger.exception("Error creating table 'cover_hashes'")
+
+
+# Dimensions of movie_stats table: SQL expression of a movies row (NEW or OLD) giving the value of the dimension
+STATS_DIMENSIONS: dict[str, str] = {
+    "genre": "coalesce(nullif({row}.genre, ''), 'unknown')",
+    "decade": "coalesce(({row}.release_year / 10) * 10, 'unknown')",
+    # Host of the url, e.g. 'epika.lrt.lt'
+    "source": "coalesce(CASE WHEN instr(substr({row}.url, instr({row}.url, '://') + 3), '/') > 0 "
+              "THEN substr(substr({row}.url, instr({row}.url, '://') + 3), 1, "
+              "instr(substr({row}.url, instr({row}.url, '://') + 3), '/') - 1) "
+              "ELSE substr({row}.url, instr({row}.url, '://') + 3) END, 'unknown')",
+}
+
+
+def _stats_add_sql(dimension: str, row: str) -> str:
+    """SQL statement adding the movie row to the summary of the dimension."""
+    return f"""INSERT INTO movie_stats(dimension, value, movies, durations, duration_sum)
+               VALUES('{dimension}', {STATS_DIMENSIONS[dimension].format(row=row)}, 1,
+                      {row}.duration IS NOT NULL, coalesce({row}.duration, 0))
+               ON CONFLICT(dimension, value) DO UPDATE SET movies = movies + 1,
+                   durations = durations + excluded.durations, duration_sum = duration_sum + excluded.duration_sum;"""
+
+
+def _stats_remove_sql(dimension: str, row: str) -> str:
+    """SQL statement removing the movie row from the summary of the dimension."""
+    return f"""UPDATE movie_stats SET movies = movies - 1, durations = durations - ({row}.duration IS NOT NULL),
+                   duration_sum = duration_sum - coalesce({row}.duration, 0)
+               WHERE dimension = '{dimension}' AND value = {STATS_DIMENSIONS[dimension].format(row=row)};"""
+
+
+def create_movie_stats(conn: sqlite3.Connection) -> None:
+    """Create summary table of movie counts and durations by genre, release decade and source,
+       kept up to date by triggers on the movies table"""
+
+    add_new = "\n".join(_stats_add_sql(dimension, "NEW") for dimension in STATS_DIMENSIONS)
+    remove_old = "\n".join(_stats_remove_sql(dimension, "OLD") for dimension in STATS_DIMENSIONS)
+    drop_empty = "DELETE FROM movie_stats WHERE movies <= 0;"
+    try:
+        c = conn.cursor()
+        c.execute(""" CREATE TABLE IF NOT EXISTS movie_stats (
+                          dimension TEXT NOT NULL,
+                          value TEXT NOT NULL,
+                          movies INTEGER NOT NULL,
+                          durations INTEGER NOT NULL,
+                          duration_sum INTEGER NOT NULL,
+                          PRIMARY KEY (dimension, value)
+                      ) WITHOUT ROWID; """)
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS movie_stats_insert AFTER INSERT ON movies BEGIN {add_new} END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS movie_stats_delete AFTER DELETE ON movies "
+                  f"BEGIN {remove_old} {drop_empty} END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS movie_stats_update AFTER UPDATE OF genre, release_year, duration, url "
+                  f"ON movies BEGIN {remove_old} {add_new} {drop_empty} END")
+    except sqlite3.Error:
+        logger.exception("Error creating table 'movie_stats'")
+
+
+def create_movie_changes(conn: sqlite3.Connection) -> None:
+    """Create a counter of updates and deletes of existing movies, kept up to date by triggers on the movies table.
+       Readers caching movies reload them when it changes, otherwise only rows with new ids need to be read"""
+
+    bump = "UPDATE movie_changes SET changes = changes + 1 WHERE id = 1;"
+    try:
+        c = conn.cursor()
+        c.execute(""" CREATE TABLE IF NOT EXISTS movie_changes (
+                          id INTEGER PRIMARY KEY CHECK (id = 1),
+                          changes INTEGER NOT NULL
+                      ); """)
+        c.execute("INSERT OR IGNORE INTO movie_changes(id, changes) VALUES(1, 0)")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS movie_changes_update AFTER UPDATE OF genre, release_year, duration "
+                  f"ON movies BEGIN {bump} END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS movie_changes_delete AFTER DELETE ON movies BEGIN {bump} END")
+    except sqlite3.Error:
+        logger.exception("Error creating table 'movie_changes'")
+
+
+def rebuild_movie_stats(conn: sqlite3.Connection) -> None:
+    """Recompute movie_stats from all movies, used when the table is created for an existing database"""
+
+    conn.execute("DELETE FROM movie_stats")
+    for dimension, expression in STATS_DIMENSIONS.items():
+        conn.execute(f"""INSERT INTO movie_stats(dimension, value, movies, durations, duration_sum)
+                         SELECT '{dimension}', {expression.format(row='movies')}, count(*), count(duration),
+                                coalesce(sum(duration), 0)
+                         FROM movies GROUP BY 2""")
+
+
+def read_movie_stats(databases: list[str]) -> dict[str, dict[str, list[int]]]:
+    """Read movie_stats of the databases and add them up: movies, durations and duration sum by dimension value."""
+    stats: dict[str, dict[str, list[int]]] = {dimension: {} for dimension in STATS_DIMENSIONS}
+    for database in databases:
+        conn = create_connection(database, read_only=True)
+        if conn:
+            try:
+                with metrics.timer("stats_query"):
+                    rows = conn.execute("SELECT dimension, value, movies, durations, duration_sum "
+                                        "FROM movie_stats").fetchall()
+                for dimension, value, *numbers in rows:
+                    totals = stats.setdefault(dimension, {}).setdefault(str(value), [0, 0, 0])
+                    for i, number in enumerate(numbers):
+                        totals[i] += number
+            except sqlite3.Error:
+                logger.exception("Error reading movie stats of database '%s'.", str(database))
+            finally:
+                conn.close()
+    return stats
+
+
 def movie_exists(conn: sqlite3.Connection, url: str) -> bool:
     """Check if a movie with the given url already exists in the database"""
 
@@ -101,14 +370,84 @@ def movie_exists(conn: sqlite3.Connection, url: str) -> bool:
         return False
 
 
-def insert_movie(conn: sqlite3.Connection, movie: tuple) -> None:
-    """Insert a new movie into the movies table with URL"""
+@metrics.timed("db_refresh")
+def refresh_presence(conn: sqlite3.Connection, urls: list[str], date: str) -> tuple[list[str], int, int]:
+    """Compare urls found by a fresh shallow scrape with the movies table in one set based pass.
+       Marks missing movies as disappeared, reactivates returned ones and returns new urls with both counts."""
+
+    cur = conn.cursor()
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS seen_urls (url TEXT PRIMARY KEY)")
+    cur.execute("DELETE FROM seen_urls")
+    cur.executemany("INSERT OR IGNORE INTO seen_urls(url) VALUES(?)", [(url,) for url in urls])
+
+    cur.execute("""UPDATE movies SET date_of_disappearance = ?
+                   WHERE date_of_disappearance IS NULL AND url NOT IN (SELECT url FROM seen_urls)""", (date,))
+    disappeared = cur.rowcount
+    cur.execute("""UPDATE movies SET date_of_disappearance = NULL
+                   WHERE date_of_disappearance IS NOT NULL AND url IN (SELECT url FROM seen_urls)""")
+    reactivated = cur.rowcount
+    new_urls = [row[0] for row in cur.execute("""SELECT s.url FROM seen_urls s
+                                                 LEFT JOIN movies m ON m.url = s.url WHERE m.id IS NULL""")]
+    cur.execute("DROP TABLE seen_urls")
+    conn.commit()
+    return new_urls, disappeared, reactivated
+
+
+def count_present_movies(conn: sqlite3.Connection) -> int:
+    """Count movies not marked as disappeared"""
+    return conn.execute("SELECT count(*) FROM movies WHERE date_of_disappearance IS NULL").fetchone()[0]
+
+
+@metrics.timed("db_views")
+def append_views(conn: sqlite3.Connection, views: list[tuple[str, int]], recorded_at: int) -> int:
+    """Append view counts of known movie urls to views_history and update their views_count in one pass.
+       Returns the number of appended rows."""
+
+    cur = conn.cursor()
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS seen_views (url TEXT PRIMARY KEY, views INTEGER NOT NULL)")
+    cur.execute("DELETE FROM seen_views")
+    cur.executemany("INSERT OR REPLACE INTO seen_views(url, views) VALUES(?,?)", views)
+
+    cur.execute("""INSERT OR IGNORE INTO views_history(movie_id, recorded_at, views)
+                   SELECT m.id, ?, s.views FROM seen_views s JOIN movies m ON m.url = s.url""", (recorded_at,))
+    appended = cur.rowcount
+    cur.execute("""UPDATE movies SET views_count = (SELECT views FROM seen_views s WHERE s.url = movies.url)
+                   WHERE url IN (SELECT url FROM seen_views)""")
+    cur.execute("DROP TABLE seen_views")
+    conn.commit()
+    return appended
+
+
+@metrics.timed("db_write")
+def insert_movie(conn: sqlite3.Connection, movie: tuple, commit: bool = True) -> int:
+    """Insert a new movie into the movies table with URL and return its id"""
 
     sql = '''INSERT INTO movies(title, image, description, release_year, duration, genre, url, date_of_first_finding, 
     date_of_disappearance, related_persons, views_count, is_memorable) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)'''
     cur = conn.cursor()
     cur.execute(sql, movie)
-    conn.commit()
+    if commit:
+        conn.commit()
+    return cur.lastrowid
+
+
+def insert_original_image(conn: sqlite3.Connection, movie_id: int, image: bytes) -> None:
+    """Keep the original image of the movie, the first kept original is never overwritten"""
+
+    conn.execute("INSERT OR IGNORE INTO original_images(movie_id, image) VALUES(?,?)", (movie_id, image))
+
+
+def insert_views(conn: sqlite3.Connection, movie_id: int, recorded_at: int, views: int) -> None:
+    """Append one point to views history of the movie"""
+
+    conn.execute("INSERT OR IGNORE INTO views_history(movie_id, recorded_at, views) VALUES(?,?,?)",
+                 (movie_id, recorded_at, views))
+
+
+def insert_cover_hash(conn: sqlite3.Connection, movie_id: int, dhash: int) -> None:
+    """Store the perceptual hash of the movie cover"""
+
+    conn.execute("INSERT OR REPLACE INTO cover_hashes(movie_id, dhash) VALUES(?,?)", (movie_id, dhash))
 
 
 @loggable
@@ -116,15 +455,69 @@ def execute_query(query: str, databases: list[str]) -> list[tuple]:
     """Execute a query on both data and return the combined results."""
     results = []
     for database in databases:
-        conn = create_connection(database)
+        conn = create_connection(database, read_only=True)
         if conn:
             try:
-                cur = conn.cursor()
-                cur.execute(query)
-                results.extend(cur.fetchall())
+                start = time.perf_counter()
+                with metrics.timer("query_execution"):
+                    cur = conn.cursor()
+                    cur.execute(query)
+                    rows = cur.fetchall()
+                duration_ms = (time.perf_counter() - start) * 1000
+                metrics.inc("query_rows", len(rows))
+                if duration_ms >= config["queries"]["slow_query_ms"]:
+                    metrics.inc("slow_queries")
+                    slow_query_logger.info("%.1f ms | %s rows | %s | %s", duration_ms, len(rows), database,
+                                           " ".join(query.split()))
+                results.extend(rows)
                 conn.close()
             except sqlite3.Error:
                 logger.exception("Error executing query on database '%s'.", str(database))
                 if conn:
                     conn.close()
     return results
+
+
+def explain_query(query: str, databases: list[str]) -> list[tuple[str, list[str], bool]]:
+    """Return EXPLAIN QUERY PLAN steps of the query for each database and whether they scan a whole table."""
+    plans = []
+    for database in databases:
+        conn = create_connection(database, read_only=True)
+        if conn:
+            try:
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+                # Indent steps by their depth in the plan tree
+                depths = {0: -1}
+                steps = []
+                for node_id, parent_id, _, detail in rows:
+                    depths[node_id] = depths.get(parent_id, -1) + 1
+                    steps.append("  " * depths[node_id] + detail)
+                plans.append((database, steps, any(FULL_SCAN_PATTERN.search(step) for step in steps)))
+            except sqlite3.Error as e:
+                plans.append((database, [f"Error: {e}"], False))
+            finally:
+                conn.close()
+    return plans
+
+
+def stream_query(query: str, databases: list[str], chunk_size: int) -> Iterator[tuple[list[str], list[tuple]]]:
+    """Execute a query on each database and yield column names with chunks of rows fetched by fetchmany."""
+    for database in databases:
+        conn = create_connection(database, read_only=True)
+        if conn:
+            try:
+                cur = conn.cursor()
+                with metrics.timer("query_execution"):
+                    cur.execute(query)
+                columns = [column[0] for column in cur.description or []]
+                while True:
+                    with metrics.timer("query_fetch"):
+                        rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    metrics.inc("query_rows", len(rows))
+                    yield columns, rows
+            except sqlite3.Error:
+                logger.exception("Error executing query on database '%s'.", str(database))
+            finally:
+                conn.close()
@@ -1,96 +1,218 @@
 # Import libraries
-import os
-import csv
+import threading
+import time
 from datetime import datetime
 import sqlite3
 import logging
+from typing import NamedTuple, Optional
 
 # Import functions and classes from other modules of the app
-from db_operations import create_connection, movie_exists, insert_movie
-from scraping import shallow_scrape_epika, deep_scrape_epika, shallow_scrape_mediateka, \
-    deep_scrape_mediateka
+from db_operations import create_connection, movie_exists, insert_movie, insert_original_image, refresh_presence,\
+    count_present_movies, append_views, insert_views, insert_cover_hash
+from ingest import IngestWriter
+from image_processing import prepare_image, cover_hash
+from page_parsing import parse_views_count
+from frontier import CrawlFrontier, CrawlScheduler
+from scraping import WebDriverContext, shallow_scrape_epika, shallow_scrape_mediateka, deep_scrape
+from config_loader import Config
 
 
 # Create a logger
 logger = logging.getLogger(__name__)
 
+# Create an instance of the Config class
+config = Config().settings
 
-def shallow_scrape_wrapper(driver, database, filename):
-    """Checks if previous file exist, as well for the same movies in database and writes additional scrape
-    results to csv file"""
 
-    # Check if previous shallow scrape exists, if new shallow scrape needed, delete csv file manually
-    if os.path.exists(filename):
-        logger.info("File '%s' already exists. Skipping shallow scrape.", filename)
-        return
+def record_views(conn: sqlite3.Connection, results: list[tuple]) -> None:
+    """Appends view counts of lrt.lt/tema/filmai listing to views history of known movies"""
 
-    # Perform shallow scrape
-    if filename == 'temp/shallow_scrape_result_epika.csv':
-        results = shallow_scrape_epika(driver)
-    else:
-        results = shallow_scrape_mediateka(driver)
-    logger.info("Shallow scrape results returned: %s", len(results))
+    views = [(movie[1], count) for movie in results if (count := parse_views_count(movie[4])) is not None]
+    appended = append_views(conn, views, int(time.time()))
+    logger.info("View counts of %s known movies recorded", appended)
 
-    # Filter out movies that already exist in the database by movie url (sometimes the titles are the same)
-    conn = create_connection(database)
-    results_filtered = [movie for movie in results if not movie_exists(conn, movie[1])]
-    conn.close()
-    logger.info("The list of %s new movies prepared to add to database '%s'", len(results_filtered), database)
 
-    # Write filtered results to CSV file
-    with open(filename, 'w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerows(results_filtered)
-        logger.info(f"Shallow scraping data temporarily written to file '%s'", filename)
+def shallow_scrape_wrapper(driver, database, site):
+    """Checks if previous shallow scrape waits for deep scrape, as well for the same movies in database and adds
+    new movies to the crawl frontier"""
 
+    # Views history needs the whole listing, also when previous shallow scrape waits for deep scrape
+    views = site == "mediateka" and config["scraping"]["record_views"]
+    frontier = CrawlFrontier()
+    try:
+        # Check if previous shallow scrape is not deep scraped yet
+        pending = frontier.count(site, "deep")
+        if pending and not views:
+            logger.info("%s pages of '%s' wait for deep scrape. Skipping shallow scrape.", pending, site)
+            return
+
+        # Perform shallow scrape
+        conn = create_connection(database)
+        try:
+            scheduler = CrawlScheduler(frontier, [site], "shallow")
+            if site == "epika":
+                results = shallow_scrape_epika(driver, scheduler)
+            elif views:
+                # Stop on known movies would leave views of older movies unrecorded
+                results = shallow_scrape_mediateka(driver, scheduler)
+                record_views(conn, results)
+            else:
+                results = shallow_scrape_mediateka(driver, scheduler, is_known=lambda url: movie_exists(conn, url))
+            logger.info("Shallow scrape results returned: %s", len(results))
+            if pending:
+                logger.info("%s pages of '%s' wait for deep scrape. New movies are not queued.", pending, site)
+                return
+
+            # Filter out movies that already exist in the database by movie url (sometimes the titles are the same)
+            results_filtered = [movie for movie in results if not movie_exists(conn, movie[1])]
+        finally:
+            conn.close()
+
+        # Queue movie pages for deep scrape
+        frontier.add([(movie[1], list(movie)) for movie in results_filtered], site, "deep", requeue=True)
+        logger.info("The list of %s new movies queued for deep scrape to database '%s'", len(results_filtered),
+                    database)
+    finally:
+        frontier.close()
 
-def deep_scrape_wrapper(driver, database, shallow_filename):
-    """Checks if shallow scrape file exist and writes deep scrape results to SQLite3 database"""
 
-    # Check if shallow scrape was successfully created
-    if not os.path.exists(shallow_filename):
-        logger.info("File '%s' does not exist. Cannot perform deep scrape.", shallow_filename)
-        return
+class IngestRecord(NamedTuple):
+    """Movie prepared for writing: the movies row, original image to keep, cover hash and views"""
+    row: tuple
+    original_image: Optional[bytes]
+    dhash: Optional[int]
+    views: Optional[int]
+    found_at: int
 
-    # Read data from the shallow scrape CSV file
-    with open(shallow_filename, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        data_list = [tuple(row) for row in reader]
 
-    # Perform deep scrape
-    if shallow_filename == 'temp/shallow_scrape_result_epika.csv':
-        results = deep_scrape_epika(driver, data_list)
+def prepare_movie(site: str, movie: tuple) -> IngestRecord:
+    """Prepares deep scrape result of the site for writing, image work is done by the calling thread"""
+
+    # Downscale and re-encode the cover before storing it
+    image, original_image = prepare_image(movie[1])
+    # Add the current timestamp to date_of_first_finding
+    found_at = time.time()
+    timestamp = datetime.fromtimestamp(found_at).strftime("%Y-%m-%d %H:%M:%S")
+    if site == "epika":
+        row = (movie[0], image) + movie[2:] + (timestamp, None, None, None, False)
+        views = None
     else:
-        results = deep_scrape_mediateka(driver, data_list)
-    logger.info("Deep scrape results returned: %s", len(results))
+        row = (movie[0], image, movie[2], movie[3], movie[4], movie[5], movie[6], timestamp, None, None, movie[7],
+               False)
+        views = movie[7]
+    return IngestRecord(row, original_image, cover_hash(image), views, int(found_at))
+
+
+def write_movie(conn: sqlite3.Connection, record: IngestRecord) -> None:
+    """Writes prepared movie to SQLite3 database without committing"""
+
+    movie_id = insert_movie(conn, record.row, commit=False)
+    if record.original_image:
+        insert_original_image(conn, movie_id, record.original_image)
+    if record.dhash is not None:
+        insert_cover_hash(conn, movie_id, record.dhash)
+    # The first point of views history
+    if record.views is not None:
+        insert_views(conn, movie_id, record.found_at, record.views)
+
 
-    # Write results to database
-    conn = create_connection(database)
-    counter = 0
+def deep_scrape_wrapper(driver, database, site):
+    """Deep scrapes pages of the site queued in the crawl frontier and writes results to SQLite3 database"""
+
+    frontier = CrawlFrontier()
+    # Check if shallow scrape queued any pages
+    if not frontier.count(site, "deep"):
+        logger.info("No pages of '%s' wait for deep scrape. Cannot perform deep scrape.", site)
+        frontier.close()
+        return
+
+    # Perform deep scrape, the page is marked as crawled after its movie is committed by the writer
+    writer = IngestWriter(database, write_movie)
     try:
-        # Start a transaction
-        conn.execute('BEGIN')
-        # Insert each movie into the database
-        for movie in results:
-            counter += 1
-            # Add the current timestamp to date_of_first_finding
-            if shallow_filename == 'temp/shallow_scrape_result_epika.csv':
-                movie_with_timestamp = movie + (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), None, None, None, False)
-                insert_movie(conn, movie_with_timestamp)
-            else:
-                movie_with_timestamp = (movie[0], movie[1], movie[2], movie[3], movie[4], movie[5], movie[6],
-                                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"), None, None, movie[7], False)
-                insert_movie(conn, movie_with_timestamp)
-        # Commit the transaction
-        conn.commit()
-        logger.info("%s new movies added to database '%s'", counter, database)
-    except sqlite3.Error as e:
-        # Roll back any change if error occurs
-        conn.rollback()
-        logger.exception("An error occurred")
+        for _, movie, report in deep_scrape(driver, CrawlScheduler(frontier, [site], "deep")):
+            writer.submit(prepare_movie(site, movie), on_stored=report)
     finally:
-        # Close the database connection
-        conn.close()
+        writer.close()
+        frontier.close()
+    logger.info("%s new movies added to database '%s'", writer.stored, database)
+
 
-    # Remove the shallow scrape file
-    os.remove(shallow_filename)
+def refresh_wrapper(driver, database, site):
+    """Compares a fresh shallow scrape of the site with the database, marks disappeared and returned movies
+    and deep scrapes only new movies"""
+
+    # Demo scraping lists only a part of the site, the rest of movies would be marked as disappeared
+    if config["demo"]["is_demo"]:
+        logger.warning("Refresh of '%s' is not available in demo mode.", site)
+        return
+
+    frontier = CrawlFrontier()
+    try:
+        # Full shallow scrape, incremental harvesting would miss movies still present on the site
+        scheduler = CrawlScheduler(frontier, [site], "shallow")
+        if site == "epika":
+            results = shallow_scrape_epika(driver, scheduler)
+        else:
+            results = shallow_scrape_mediateka(driver, scheduler)
+
+        # Missing pages would mark their movies as disappeared, so incomplete scrapes are not compared
+        unfinished = frontier.count(site, "shallow", ('pending', 'failed', 'abandoned'))
+        if not results or unfinished:
+            logger.warning("Shallow scrape of '%s' is incomplete (%s pages not scraped). Skipping refresh.",
+                           site, unfinished)
+            return
+
+        conn = create_connection(database)
+        try:
+            # A listing cut short by the site finds only a part of present movies
+            present = count_present_movies(conn)
+            listed = len({movie[1] for movie in results})
+            if listed < present * config["scraping"]["refresh_min_share"]:
+                logger.warning("Shallow scrape of '%s' found %s movies of %s present in database. Skipping refresh.",
+                               site, listed, present)
+                return
+            new_urls, disappeared, reactivated = refresh_presence(conn, [movie[1] for movie in results],
+                                                                  datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            if site == "mediateka":
+                record_views(conn, results)
+        finally:
+            conn.close()
+        logger.info("Refresh of '%s': %s movies found, %s new, %s disappeared, %s returned", database,
+                    len(results), len(new_urls), disappeared, reactivated)
+
+        # Queue only new movie pages for deep scrape
+        new_urls = set(new_urls)
+        frontier.add([(movie[1], list(movie)) for movie in results if movie[1] in new_urls], site, "deep",
+                     requeue=True)
+    finally:
+        frontier.close()
+
+    deep_scrape_wrapper(driver, database, site)
+
+
+def crawl_wrapper(sites: list[str], workers: int) -> None:
+    """Deep scrapes pages of several sites queued in the crawl frontier with parallel browser workers,
+    movies of each site are written by a single writer"""
+
+    frontier = CrawlFrontier()
+    scheduler = CrawlScheduler(frontier, sites, "deep")
+    writers = {site: IngestWriter(config["data"][site], write_movie) for site in sites}
+
+    def worker():
+        try:
+            with WebDriverContext() as driver:
+                for site, movie, report in deep_scrape(driver, scheduler):
+                    writers[site].submit(prepare_movie(site, movie), on_stored=report)
+        except Exception:
+            logger.exception("Crawl worker failed")
+
+    threads = [threading.Thread(target=worker, name=f"crawl-worker-{i}") for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for writer in writers.values():
+        writer.close()
+    frontier.close()
+    logger.info("%s new movies added to databases of %s", sum(writer.stored for writer in writers.values()),
+                ", ".join(sites))
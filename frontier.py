@@ -0,0 +1,222 @@
+# Import libraries
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Iterator, NamedTuple, Optional
+from urllib.parse import urlparse
+
+# Import functions and classes from other modules of the app
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+
+class FrontierItem(NamedTuple):
+    """One page waiting in the crawl frontier, payload keeps shallow scrape data of the page"""
+    url: str
+    site: str
+    phase: str
+    priority: int
+    attempts: int
+    payload: Optional[list]
+
+
+class TokenBucket:
+    """Token bucket limiting the request rate to one host, the rate adapts to response times and errors"""
+
+    def __init__(self, rate: float, capacity: float, min_rate: float, max_rate: float, target_response_time: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_response_time = target_response_time
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def record(self, response_time: float, ok: bool) -> None:
+        """Adapt the rate: halve it on errors, slow down on slow responses and speed up slowly otherwise."""
+        with self._lock:
+            if not ok:
+                self.rate = max(self.min_rate, self.rate / 2)
+            elif response_time > self.target_response_time:
+                self.rate = max(self.min_rate, self.rate * 0.8)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.min_rate)
+
+
+class CrawlFrontier:
+    """Persistent queue of pages to crawl kept in SQLite database"""
+
+    def __init__(self, db_file: Optional[str] = None):
+        self.db_file = db_file or config["crawl"]["frontier"]
+        # Connection is shared by worker threads, access is serialized by the lock
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        self.create_table()
+
+    def create_table(self) -> None:
+        """Create the frontier table if it does not exist and release pages left in progress by a crash."""
+        with self._lock:
+            self.conn.execute(""" CREATE TABLE IF NOT EXISTS crawl_frontier (
+                                      url TEXT NOT NULL,
+                                      site TEXT NOT NULL,
+                                      phase TEXT NOT NULL,
+                                      priority INTEGER NOT NULL DEFAULT 0,
+                                      attempts INTEGER NOT NULL DEFAULT 0,
+                                      next_eligible_at REAL NOT NULL DEFAULT 0,
+                                      last_status TEXT NOT NULL DEFAULT 'pending',
+                                      payload TEXT,
+                                      PRIMARY KEY (url, phase)
+                                  ); """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_frontier_ready "
+                              "ON crawl_frontier(site, phase, last_status, next_eligible_at)")
+            self.conn.execute("UPDATE crawl_frontier SET last_status = 'pending' WHERE last_status = 'in_progress'")
+
+    def add(self, urls: list[tuple[str, Optional[list]]], site: str, phase: str, priority: int = 0,
+            requeue: bool = False) -> None:
+        """Add pages with their payload to the frontier. Known pages are queued again only if requeue is set."""
+        rows = [(url, site, phase, priority, json.dumps(payload) if payload is not None else None)
+                for url, payload in urls]
+        sql = "INSERT INTO crawl_frontier(url, site, phase, priority, payload) VALUES(?,?,?,?,?) "
+        if requeue:
+            sql += ("ON CONFLICT(url, phase) DO UPDATE SET last_status = 'pending', attempts = 0, "
+                    "next_eligible_at = 0, priority = excluded.priority, payload = excluded.payload")
+        else:
+            sql += "ON CONFLICT(url, phase) DO NOTHING"
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(sql, rows)
+            self.conn.execute("COMMIT")
+
+    def lease(self, site: str, phase: str) -> Optional[FrontierItem]:
+        """Take the eligible page of highest priority and mark it in progress."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("""SELECT url, site, phase, priority, attempts, payload FROM crawl_frontier
+                                           WHERE site = ? AND phase = ? AND last_status IN ('pending', 'failed')
+                                           AND next_eligible_at <= ?
+                                           ORDER BY priority DESC, next_eligible_at LIMIT 1""",
+                                        (site, phase, time.time())).fetchone()
+                if row:
+                    self.conn.execute("UPDATE crawl_frontier SET last_status = 'in_progress' "
+                                      "WHERE url = ? AND phase = ?", (row[0], row[2]))
+            finally:
+                self.conn.execute("COMMIT")
+        if not row:
+            return None
+        return FrontierItem(row[0], row[1], row[2], row[3], row[4], json.loads(row[5]) if row[5] else None)
+
+    def complete(self, item: FrontierItem, status: str = 'done') -> None:
+        """Mark the page as crawled."""
+        with self._lock:
+            self.conn.execute("UPDATE crawl_frontier SET last_status = ?, attempts = attempts + 1 "
+                              "WHERE url = ? AND phase = ?", (status, item.url, item.phase))
+
+    def fail(self, item: FrontierItem) -> None:
+        """Schedule the page for retry with exponential backoff or abandon it after max attempts."""
+        attempts = item.attempts + 1
+        status = 'abandoned' if attempts >= config["crawl"]["max_attempts"] else 'failed'
+        next_eligible_at = time.time() + config["crawl"]["retry_backoff"] * 2 ** (attempts - 1)
+        with self._lock:
+            self.conn.execute("UPDATE crawl_frontier SET last_status = ?, attempts = ?, next_eligible_at = ? "
+                              "WHERE url = ? AND phase = ?", (status, attempts, next_eligible_at, item.url,
+                                                              item.phase))
+        logger.info("Page '%s' failed %s times, status '%s'", item.url, attempts, status)
+
+    def seconds_until_eligible(self, site: str, phase: str) -> Optional[float]:
+        """Return time until the next page of the site becomes eligible or None if no work is left."""
+        with self._lock:
+            row = self.conn.execute("""SELECT min(next_eligible_at) FROM crawl_frontier
+                                       WHERE site = ? AND phase = ? AND last_status IN ('pending', 'failed')""",
+                                    (site, phase)).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def count(self, site: str, phase: str, statuses: tuple[str, ...] = ('pending', 'failed')) -> int:
+        """Count pages of the site in given statuses."""
+        with self._lock:
+            return self.conn.execute(f"""SELECT count(*) FROM crawl_frontier WHERE site = ? AND phase = ?
+                                         AND last_status IN ({','.join('?' * len(statuses))})""",
+                                     (site, phase) + statuses).fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class CrawlScheduler:
+    """Feeds frontier pages to workers, interleaving sites under per-host rate limits"""
+
+    def __init__(self, frontier: CrawlFrontier, sites: list[str], phase: str):
+        self.frontier = frontier
+        self.sites = sites
+        self.phase = phase
+        self.buckets: dict[str, TokenBucket] = {}
+        self._next_site = 0
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        """Return the token bucket of the host of the url."""
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(config["crawl"]["rate"], config["crawl"]["burst"],
+                                                 config["crawl"]["min_rate"], config["crawl"]["max_rate"],
+                                                 config["crawl"]["target_response_time"])
+            return self.buckets[host]
+
+    def next_item(self) -> Optional[FrontierItem]:
+        """Return next page to crawl once its host allows it, or None when no work is left. Thread safe."""
+        while True:
+            with self._lock:
+                # Start from the next site each time to interleave the work of sites
+                order = self.sites[self._next_site:] + self.sites[:self._next_site]
+                self._next_site = (self._next_site + 1) % len(self.sites)
+            for site in order:
+                item = self.frontier.lease(site, self.phase)
+                if item:
+                    self.bucket(item.url).acquire()
+                    return item
+
+            waits = [wait for wait in (self.frontier.seconds_until_eligible(site, self.phase) for site in self.sites)
+                     if wait is not None]
+            if not waits:
+                return None
+            time.sleep(min(min(waits), 5.0) or 0.1)
+
+    def __iter__(self) -> Iterator[FrontierItem]:
+        while (item := self.next_item()) is not None:
+            yield item
+
+    def report(self, item: FrontierItem, response_time: float, ok: bool, status: str = 'done') -> None:
+        """Record the result of crawling the page in the frontier and adapt the rate of its host."""
+        self.bucket(item.url).record(response_time, ok)
+        self.finish(item, ok, status)
+
+    def finish(self, item: FrontierItem, ok: bool, status: str = 'done') -> None:
+        """Record the result of the page in the frontier only, for failures not caused by its host."""
+        if ok:
+            self.frontier.complete(item, status)
+        else:
+            self.frontier.fail(item)
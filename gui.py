@@ -2,17 +2,21 @@
 import tkinter as tk
 from tkinter import ttk
 import tkinter.font as tkFont
-from PIL import Image, ImageTk
 import io
 import logging
+from typing import TYPE_CHECKING
 
-from PIL.ImageTk import PhotoImage
+# PIL, Selenium and scraping modules are imported on first use to keep startup fast
+if TYPE_CHECKING:
+    from PIL.Image import Image as PILImage
+    from PIL.ImageTk import PhotoImage
 
 # Import functions and classes from other modules of the app
-from scraping import WebDriverContext
-from file_operations import shallow_scrape_wrapper, deep_scrape_wrapper
-from db_operations import execute_query as db_execute_query
+from db_operations import execute_query as db_execute_query, read_movie_stats, explain_query
 from config_loader import Config, LargeStrings
+from metrics import metrics
+from profiling import profiled, ProfileReport
+from column_store import ColumnStore, numpy_available
 
 # Create an instance of the Config class
 config = Config().settings
@@ -30,6 +34,91 @@ current_item = None
 # Global dictionary to store image references - prevent garbage collector
 image_references = {}
 
+# Scheduled update of rows shown by the filter panel
+filter_job = None
+
+
+@metrics.timed("thumbnail_decode")
+def resize_image_blob(image_blob: bytes) -> 'PILImage':
+    """Decode the image blob and resize it to thumbnail size."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_blob)) as img:
+        # Resize the image
+        img.thumbnail((220, 135), Image.Resampling.LANCZOS)
+
+        with io.BytesIO() as output:
+            img.save(output, format=img.format)
+            output.seek(0)
+            thumbnail = Image.open(output)
+            thumbnail.load()
+            return thumbnail
+
+
+def get_thumbnail(image_blob) -> 'PhotoImage | None':
+    """Convert the image blob to a PhotoImage object and resize."""
+    from PIL import ImageTk
+
+    try:
+        thumbnail = ImageTk.PhotoImage(image=resize_image_blob(image_blob))
+        image_references[id(thumbnail)] = thumbnail
+        return thumbnail
+    except Exception as e:
+        logger.warning("Error in get_thumbnail: %s", e)
+        return None
+
+
+def show_profile_summary(report: ProfileReport) -> None:
+    """Show the top hotspots of the profiled action in a separate window."""
+    window = tk.Toplevel()
+    window.title(f"Profile: {report.action}")
+    text = tk.Text(window, width=140, height=40, font=("Courier", 10))
+    text.insert('1.0', report.summary())
+    text.config(state='disabled')
+    text.pack(fill='both', expand=True)
+
+
+def show_query_plans(query: str, databases: list[str]) -> None:
+    """Show EXPLAIN QUERY PLAN of the query for each database, flagging full table scans."""
+    window = tk.Toplevel()
+    window.title("Query plan")
+    text = tk.Text(window, width=120, height=25, font=("Courier", 10))
+    text.tag_configure('warning', foreground='red')
+    for database, steps, full_scan in explain_query(query, databases):
+        text.insert('end', f"{database}\n")
+        text.insert('end', "\n".join(steps) + "\n")
+        if full_scan:
+            text.insert('end', "Full table scan: every row is read, of 'movies' including images. "
+                               "Consider filtering on an indexed column.\n", 'warning')
+        text.insert('end', "\n")
+    text.config(state='disabled')
+    text.pack(fill='both', expand=True)
+
+
+def show_stats(databases: list[str]) -> None:
+    """Show movie counts and average durations by genre, release decade and source, read from summary tables."""
+    stats = read_movie_stats(databases)
+    window = tk.Toplevel()
+    window.title("Stats")
+    window.geometry("700x500")
+    notebook = ttk.Notebook(window)
+    notebook.pack(fill='both', expand=True)
+
+    for dimension, values in stats.items():
+        columns = ("value", "movies", "share", "avg_duration")
+        tree = ttk.Treeview(notebook, columns=columns, show='headings', style='Stats.Treeview')
+        for col in columns:
+            tree.heading(col, text=col.replace('_', ' ').title())
+            tree.column(col, width=120, anchor='w' if col == "value" else 'center')
+        total = sum(movies for movies, _, _ in values.values()) or 1
+        # Decades in time order, other dimensions by number of movies
+        order = sorted(values) if dimension == "decade" else sorted(values, key=lambda v: -values[v][0])
+        for value in order:
+            movies, durations, duration_sum = values[value]
+            tree.insert('', 'end', values=(value, movies, f"{movies / total:.1%}",
+                                           round(duration_sum / durations) if durations else ''))
+        notebook.add(tree, text=dimension.title())
+
 
 def run_gui():
     """Launches the graphical user interface for the application."""
@@ -38,9 +127,20 @@ def run_gui():
         """Execute a query on the specified data and return the combined results."""
         return db_execute_query(query, [config["data"]["epika"], config["data"]["mediateka"]])
 
+    def show_rows(results: list[tuple]) -> None:
+        """Replaces Treeview content with movie rows"""
+        treeview.delete(*treeview.get_children())
+        image_references.clear()  # Clear previous image references
+
+        for ind, row in enumerate(results):
+            image_blob = row[2]
+            thumbnail = get_thumbnail(image_blob)
+            if thumbnail:
+                image_references[ind] = thumbnail
+                treeview.insert('', 'end', image=thumbnail, values=row)
+
     def update_treeview():
         """Updates Treeview with query results"""
-        global image_references
 
         # Check if the Entry widget has a query; if not, use the ComboBox selection
         query = sql_entry.get() if sql_entry.get() != entry_placeholder else sql_combo.get()
@@ -48,37 +148,58 @@ def run_gui():
         # Check if the query is not the placeholder text
         if query not in [entry_placeholder, combo_placeholder]:
             try:
-                results = execute_query(query)
-                treeview.delete(*treeview.get_children())
-                image_references.clear()  # Clear previous image references
-
-                for ind, row in enumerate(results):
-                    image_blob = row[2]
-                    thumbnail = get_thumbnail(image_blob)
-                    if thumbnail:
-                        image_references[ind] = thumbnail
-                        treeview.insert('', 'end', image=thumbnail, values=row)
+                with profiled("query") as report:
+                    show_rows(execute_query(query))
+                if report.enabled:
+                    show_profile_summary(report)
             except Exception as e:
                 logger.warning("Error executing query: %s", e)
         else:
             logger.info("Please enter a valid SQL query.")
 
-    def get_thumbnail(image_blob) -> PhotoImage | None:
-        """Convert the image blob to a PhotoImage object and resize."""
-        try:
-            with Image.open(io.BytesIO(image_blob)) as img:
-                # Resize the image
-                img.thumbnail((220, 135), Image.Resampling.LANCZOS)
-
-                with io.BytesIO() as output:
-                    img.save(output, format=img.format)
-                    output.seek(0)
-                    thumbnail = ImageTk.PhotoImage(image=Image.open(output))
-                    image_references[id(thumbnail)] = thumbnail
-                    return thumbnail
-        except Exception as e:
-            logger.warning("Error in get_thumbnail: %s", e)
-            return None
+    def explain_current_query():
+        """Shows query plan of the query in the Entry or ComboBox"""
+        query = sql_entry.get() if sql_entry.get() != entry_placeholder else sql_combo.get()
+        if query not in [entry_placeholder, combo_placeholder]:
+            show_query_plans(query, [config["data"]["epika"], config["data"]["mediateka"]])
+        else:
+            logger.info("Please enter a valid SQL query.")
+
+    def filter_values() -> dict:
+        """Reads filters of the filter panel, ranges equal to full bounds are not applied"""
+        filters = {}
+        for column, (scale_from, scale_to, low, high) in filter_scales.items():
+            bounds = (scale_from.get(), scale_to.get())
+            if bounds != (low, high):
+                filters[column + "s"] = (min(bounds), max(bounds))
+        if genre_combo.get() != 'All':
+            filters["genre"] = genre_combo.get()
+        if site_combo.get() != 'All':
+            filters["site"] = site_combo.get()
+        return filters
+
+    def on_filter_change(*_) -> None:
+        """Counts movies matching the filters at once and shows their rows after the user stops changing them"""
+        global filter_job
+        count_label.config(text=f"{int(column_store.mask(**filter_values()).sum())} movies")
+        if filter_job:
+            root.after_cancel(filter_job)
+        filter_job = root.after(config["column_store"]["show_delay_ms"], show_filtered_rows)
+
+    def show_filtered_rows() -> None:
+        """Loads database changes into the column store and shows full rows of the first filtered movies"""
+        global filter_job
+        filter_job = None
+        if column_store.refresh():
+            genre_combo['values'] = ['All'] + sorted(column_store.genres)
+        mask = column_store.mask(**filter_values())
+        count_label.config(text=f"{int(mask.sum())} movies")
+        results = []
+        for site, ids in column_store.ids(mask, config["column_store"]["max_rows"]).items():
+            if ids:
+                results.extend(db_execute_query(f"SELECT * FROM movies WHERE id IN ({','.join(map(str, ids))})",
+                                                [config["data"][site]]))
+        show_rows(results)
 
     def show_tooltip(event):
         global tooltip_window, current_item
@@ -128,30 +249,41 @@ def run_gui():
             event.widget.insert(0, default_text)
             event.widget.config(fg='grey')
 
-    # Functions for menu commands
+    # Functions for menu commands, scraping modules load Selenium and are imported on first use
     def proceed_shallow_scrape_epika() -> None:
         """Perform shallow scrape of epika.lrt.lt"""
-        with WebDriverContext() as driver:
-            shallow_scrape_wrapper(driver, config["data"]["epika"], filename='temp/shallow_scrape_result_epika.csv')
+        from scraping import WebDriverContext
+        from file_operations import shallow_scrape_wrapper
+        with profiled("shallow_scrape_epika"), WebDriverContext() as driver:
+            shallow_scrape_wrapper(driver, config["data"]["epika"], "epika")
 
     def proceed_deep_scrape_epika() -> None:
         """Perform deep scrape of epika.lrt.lt"""
-        with WebDriverContext() as driver:
-            deep_scrape_wrapper(driver, config["data"]["epika"],
-                                shallow_filename='temp/shallow_scrape_result_epika.csv')
+        from scraping import WebDriverContext
+        from file_operations import deep_scrape_wrapper
+        with profiled("deep_scrape_epika"), WebDriverContext() as driver:
+            deep_scrape_wrapper(driver, config["data"]["epika"], "epika")
 
     def proceed_shallow_scrape_mediateka() -> None:
         """Perform shallow scrape of lrt.lt/tema/filmai"""
-        with WebDriverContext() as driver:
-            shallow_scrape_wrapper(driver, config["data"]["mediateka"],
-                                   filename='temp/shallow_scrape_result_mediateka.csv')
+        from scraping import WebDriverContext
+        from file_operations import shallow_scrape_wrapper
+        with profiled("shallow_scrape_mediateka"), WebDriverContext() as driver:
+            shallow_scrape_wrapper(driver, config["data"]["mediateka"], "mediateka")
 
     def proceed_deep_scrape_mediateka() -> None:
         """Perform deep scrape of lrt.lt/tema/filmai"""
-        with WebDriverContext() as driver:
-            deep_scrape_wrapper(driver, config["data"]["mediateka"], shallow_filename='temp'
-                                                                                      '/shallow_scrape_result_mediateka'
-                                                                                      '.csv')
+        from scraping import WebDriverContext
+        from file_operations import deep_scrape_wrapper
+        with profiled("deep_scrape_mediateka"), WebDriverContext() as driver:
+            deep_scrape_wrapper(driver, config["data"]["mediateka"], "mediateka")
+
+    def proceed_refresh(site: str) -> None:
+        """Mark disappeared and returned movies of the site and deep scrape new ones"""
+        from scraping import WebDriverContext
+        from file_operations import refresh_wrapper
+        with profiled(f"refresh_{site}"), WebDriverContext() as driver:
+            refresh_wrapper(driver, config["data"][site], site)
 
     # Main application window
     root = tk.Tk()
@@ -169,6 +301,14 @@ def run_gui():
     scrape_menu.add_command(label="Deep scrape Epika", command=lambda: proceed_deep_scrape_epika())
     scrape_menu.add_command(label="Shallow scrape Mediateka", command=lambda: proceed_shallow_scrape_mediateka())
     scrape_menu.add_command(label="Deep scrape Mediateka", command=lambda: proceed_deep_scrape_mediateka())
+    scrape_menu.add_separator()
+    scrape_menu.add_command(label="Refresh Epika", command=lambda: proceed_refresh("epika"))
+    scrape_menu.add_command(label="Refresh Mediateka", command=lambda: proceed_refresh("mediateka"))
+
+    stats_menu = tk.Menu(menu_bar, tearoff=0)
+    menu_bar.add_cascade(label="Stats", menu=stats_menu)
+    stats_menu.add_command(label="Show stats",
+                           command=lambda: show_stats([config["data"]["epika"], config["data"]["mediateka"]]))
 
     # Placeholder text for Entry and Combobox
     entry_placeholder = 'Write here your SQL query'
@@ -192,12 +332,17 @@ def run_gui():
     sql_entry.bind('<FocusIn>', lambda event, default_text=entry_placeholder: on_entry_click(event, default_text))
     sql_entry.bind('<FocusOut>', lambda event, default_text=entry_placeholder: on_focusout(event, default_text))
     sql_entry.grid(row=1, column=0, sticky='ew')
-    execute_button = ttk.Button(root, text="Execute", command=update_treeview)
-    execute_button.grid(row=1, column=1, sticky='ew')
+    # Execute and Explain buttons side by side next to the query entry
+    button_frame = ttk.Frame(root)
+    button_frame.grid(row=1, column=1, sticky='ew')
+    execute_button = ttk.Button(button_frame, text="Execute", command=update_treeview)
+    execute_button.pack(side='left', fill='x', expand=True)
+    explain_button = ttk.Button(button_frame, text="Explain", command=explain_current_query)
+    explain_button.pack(side='left', fill='x', expand=True)
 
     # Treeview for database results
     columns = ("id", "title", "image", "description", "release_year", "duration", "genre", "url",
-               "date_of_first_finding", "date_of_disappearance", "related_persons", "views_count", "is_memorable")
+               "date_of_first_finding", "date_of_disappearance", "related_persons", "views_count", "is_memorable", "views_delta", "link")
 
     treeview = ttk.Treeview(root, columns=columns, selectmode='none', height=7)
     treeview.grid(row=2, column=0, columnspan=2, sticky='nsew')
@@ -207,6 +352,7 @@ def run_gui():
     scrollbar.grid(row=2, column=2, sticky='ns')
     style = ttk.Style()
     style.configure('Treeview', rowheight=135)
+    style.configure('Stats.Treeview', rowheight=22)
     treeview.configure(yscrollcommand=scrollbar.set)
 
     # Defining column attributes
@@ -226,6 +372,8 @@ def run_gui():
     treeview.heading('#11', text="related_persons", anchor='center')
     treeview.heading('#12', text="views_count", anchor='center')
     treeview.heading('#13', text="is_memorable", anchor='center')
+    treeview.heading('#14', text="views_delta", anchor='center')  # Filled by views history sample queries
+    treeview.heading('#15', text="link", anchor='center')  # Filled by movie links sample query
     treeview.column("id", width=20, anchor='center')
     treeview.column("title", width=150, anchor='w')
     treeview.column("image", width=20, anchor='center')
@@ -239,6 +387,8 @@ def run_gui():
     treeview.column("related_persons", width=20, anchor='w')
     treeview.column("views_count", width=20, anchor='center')
     treeview.column("is_memorable", width=20, anchor='center')
+    treeview.column("views_delta", width=20, anchor='center')
+    treeview.column("link", width=150, anchor='w')
 
     # Ensure the total width is close to or slightly less than 1900 pixels
 
@@ -250,8 +400,51 @@ def run_gui():
     treeview.bind("<Motion>", show_tooltip)
     treeview.bind("<Leave>", hide_tooltip)
 
+    # Filter panel over the in-memory column store, shown if NumPy is installed
+    column_store = None
+    if config["column_store"]["enabled"] and numpy_available():
+        column_store = ColumnStore({"epika": config["data"]["epika"], "mediateka": config["data"]["mediateka"]})
+    elif config["column_store"]["enabled"]:
+        logger.info("NumPy is not installed, filters are not available.")
+
+    if column_store:
+        filter_frame = ttk.Frame(root)
+        filter_frame.grid(row=3, column=0, columnspan=2, sticky='ew')
+        filter_scales = {}
+        for col, (column, label) in enumerate((("release_year", "Release year"), ("duration", "Duration"))):
+            low, high = column_store.bounds(column)
+            ttk.Label(filter_frame, text=label).grid(row=0, column=col * 2, columnspan=2)
+            scale_from = tk.Scale(filter_frame, from_=low, to=high, orient='horizontal', length=250)
+            scale_to = tk.Scale(filter_frame, from_=low, to=high, orient='horizontal', length=250)
+            scale_to.set(high)
+            scale_from.grid(row=1, column=col * 2)
+            scale_to.grid(row=1, column=col * 2 + 1)
+            filter_scales[column] = (scale_from, scale_to, low, high)
+
+        ttk.Label(filter_frame, text="Genre").grid(row=0, column=4)
+        genre_combo = ttk.Combobox(filter_frame, state='readonly', values=['All'] + sorted(column_store.genres))
+        genre_combo.set('All')
+        genre_combo.grid(row=1, column=4, padx=5)
+        genre_combo.bind('<<ComboboxSelected>>', on_filter_change)
+
+        ttk.Label(filter_frame, text="Site").grid(row=0, column=5)
+        site_combo = ttk.Combobox(filter_frame, state='readonly', values=['All'] + column_store.sites)
+        site_combo.set('All')
+        site_combo.grid(row=1, column=5, padx=5)
+        site_combo.bind('<<ComboboxSelected>>', on_filter_change)
+
+        count_label = ttk.Label(filter_frame, text=f"{len(column_store)} movies")
+        count_label.grid(row=1, column=6, padx=10)
+
+        # Scales react to dragging once all filter widgets exist
+        for scale_from, scale_to, _, _ in filter_scales.values():
+            scale_from.config(command=on_filter_change)
+            scale_to.config(command=on_filter_change)
+
     # Configure the grid
     root.grid_columnconfigure(0, weight=1)
     root.grid_rowconfigure(2, weight=1)
 
     root.mainloop()
+    if column_store:
+        column_store.close()
@@ -0,0 +1,133 @@
+# Import libraries
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+# zstd compression is used if the optional 'zstandard' package is installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Import functions and classes from other modules of the app
+from db_operations import create_connection
+from page_parsing import extract_epika_page, extract_mediateka_page
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+# File extensions of compression methods
+EXTENSIONS: dict[str, str] = {"zstd": ".html.zst", "gzip": ".html.gz"}
+
+
+def compress(data: bytes, method: str) -> bytes:
+    if method == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data: bytes, method: str) -> bytes:
+    if method == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class HtmlArchive:
+    """Archive of rendered HTML of visited pages, compressed and stored by content hash"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or config["archive"]["directory"]
+        self.method = "zstd" if config["archive"]["compression"] == "zstd" and zstandard else "gzip"
+        os.makedirs(self.directory, exist_ok=True)
+        # Connection is shared by worker threads, access is serialized by the lock
+        self.conn = sqlite3.connect(os.path.join(self.directory, "index.db"), check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute(""" CREATE TABLE IF NOT EXISTS archived_pages (
+                                      url TEXT PRIMARY KEY,
+                                      site TEXT NOT NULL,
+                                      content_hash TEXT NOT NULL,
+                                      compression TEXT NOT NULL,
+                                      archived_at TEXT NOT NULL
+                                  ); """)
+
+    def path(self, content_hash: str, method: str) -> str:
+        return os.path.join(self.directory, content_hash[:2], content_hash + EXTENSIONS[method])
+
+    def save(self, site: str, url: str, html: str) -> None:
+        """Store the page HTML unless the same content is already archived and point the url to it."""
+        data = html.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self.path(content_hash, self.method)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as file:
+                file.write(compress(data, self.method))
+            os.replace(path + ".tmp", path)
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO archived_pages(url, site, content_hash, compression, archived_at) "
+                              "VALUES(?,?,?,?,?)", (url, site, content_hash, self.method,
+                                                    datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+    def pages(self, site: str) -> list[tuple[str, str, str]]:
+        """Return url, file path and compression of archived pages of the site."""
+        with self._lock:
+            rows = self.conn.execute("SELECT url, content_hash, compression FROM archived_pages WHERE site = ?",
+                                     (site,)).fetchall()
+        return [(url, self.path(content_hash, method), method) for url, content_hash, method in rows]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def extract_archived_page(site: str, url: str, path: str, method: str) -> Optional[tuple[str, dict]]:
+    """Read archived page and extract movie fields from it. Runs in process pool workers."""
+    try:
+        with open(path, "rb") as file:
+            html = decompress(file.read(), method).decode("utf-8")
+        fields = extract_epika_page(html) if site == "epika" else extract_mediateka_page(html)
+        return url, fields
+    except Exception as e:
+        logger.warning("Error re-extracting '%s': %s", url, e)
+        return None
+
+
+def reextract_site(site: str, workers: int) -> None:
+    """Re-parse archived pages of the site in a process pool and update movies in its database."""
+    archive = HtmlArchive()
+    pages = archive.pages(site)
+    archive.close()
+    logger.info("Re-extracting %s archived pages of '%s'", len(pages), site)
+
+    sql = '''UPDATE movies SET description = coalesce(?, description), release_year = coalesce(?, release_year),
+             duration = coalesce(?, duration), genre = coalesce(?, genre) WHERE url = ?'''
+    if not pages:
+        return
+    urls, paths, methods = zip(*pages)
+    conn = create_connection(config["data"][site])
+    if conn is None:
+        return
+    counter = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor, conn:
+            results = executor.map(extract_archived_page, [site] * len(pages), urls, paths, methods, chunksize=32)
+            for result in results:
+                if result is None:
+                    continue
+                url, fields = result
+                cur = conn.execute(sql, (fields["description"], fields["release_year"], fields.get("duration"),
+                                         fields["genre"], url))
+                counter += cur.rowcount
+    finally:
+        conn.close()
+    logger.info("%s movies updated in '%s'", counter, config["data"][site])
@@ -0,0 +1,151 @@
+# Import libraries
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Optional
+
+# Import functions and classes from other modules of the app
+from db_operations import create_connection, insert_original_image, insert_cover_hash
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+
+def normalize_image(image_blob: Optional[bytes], max_dimension: int, image_format: str,
+                    quality: int) -> Optional[bytes]:
+    """Downscale the image to max dimension and re-encode it. Returns None if the image is already normalized
+       or the result is not smaller."""
+    from PIL import Image
+
+    if not image_blob:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_blob)) as img:
+            # Lossy re-encoding of a normalized image is nearly always smaller but loses quality on every run
+            if img.format == image_format and max(img.size) <= max_dimension:
+                return None
+            img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+            if image_format == "JPEG" and img.mode != "RGB":
+                img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+            with io.BytesIO() as output:
+                img.save(output, format=image_format, quality=quality, optimize=True)
+                result = output.getvalue()
+    except Exception as e:
+        logger.warning("Error normalizing image: %s", e)
+        return None
+    return result if len(result) < len(image_blob) else None
+
+
+def prepare_image(image_blob: Optional[bytes]) -> tuple[Optional[bytes], Optional[bytes]]:
+    """Ingest stage for downloaded covers. Returns the image to store and the original to keep, if any."""
+    if not config["images"]["normalize"]:
+        return image_blob, None
+    normalized = normalize_image(image_blob, config["images"]["max_dimension"], config["images"]["format"],
+                                 config["images"]["quality"])
+    if normalized is None:
+        return image_blob, None
+    return normalized, image_blob if config["images"]["keep_originals"] else None
+
+
+def cover_hash(image_blob: Optional[bytes]) -> Optional[int]:
+    """Compute 64-bit difference hash (dHash) of the image: brightness gradients of a 9x8 grayscale thumbnail.
+       Returned as a signed integer to fit SQLite INTEGER column."""
+    from PIL import Image
+
+    if not image_blob:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_blob)) as img:
+            pixels = list(img.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    except Exception as e:
+        logger.warning("Error hashing image: %s", e)
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = value << 1 | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def backfill_cover_hashes(db_name: str) -> None:
+    """Hash images of movies that have no cover hash yet using a process pool."""
+    batch_size = config["images"]["recompress_batch"]
+    counter = 0
+
+    conn = create_connection(db_name)
+    if not conn:
+        return
+    try:
+        with ProcessPoolExecutor(max_workers=config["images"]["recompress_workers"]) as executor:
+            last_id = 0
+            while True:
+                rows = conn.execute("""SELECT m.id, m.image FROM movies m LEFT JOIN cover_hashes h ON h.movie_id = m.id
+                                       WHERE m.id > ? AND m.image IS NOT NULL AND h.movie_id IS NULL
+                                       ORDER BY m.id LIMIT ?""", (last_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                hashes = executor.map(cover_hash, [image for _, image in rows], chunksize=16)
+                with conn:
+                    for (movie_id, _), value in zip(rows, hashes):
+                        if value is not None:
+                            insert_cover_hash(conn, movie_id, value)
+                            counter += 1
+                print(f"Hashed covers up to id {last_id}", end='\r')
+        print("\n")
+    finally:
+        conn.close()
+    logger.info("%s cover hashes added to '%s'", counter, db_name)
+
+
+def recompress_database(db_name: str) -> None:
+    """Normalize all images stored in the database using a process pool and report the space saved."""
+    size_before = os.path.getsize(db_name)
+    worker = partial(normalize_image, max_dimension=config["images"]["max_dimension"],
+                     image_format=config["images"]["format"], quality=config["images"]["quality"])
+    batch_size = config["images"]["recompress_batch"]
+    rows_updated = bytes_before = bytes_after = 0
+
+    conn = create_connection(db_name)
+    if not conn:
+        return
+    try:
+        with ProcessPoolExecutor(max_workers=config["images"]["recompress_workers"]) as executor:
+            last_id = 0
+            while True:
+                rows = conn.execute("SELECT id, image FROM movies WHERE id > ? AND image IS NOT NULL ORDER BY id "
+                                    "LIMIT ?", (last_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                images = executor.map(worker, [image for _, image in rows], chunksize=16)
+                with conn:
+                    for (movie_id, original), normalized in zip(rows, images):
+                        if normalized is None:
+                            continue
+                        if config["images"]["keep_originals"]:
+                            insert_original_image(conn, movie_id, original)
+                        conn.execute("UPDATE movies SET image = ? WHERE id = ?", (normalized, movie_id))
+                        rows_updated += 1
+                        bytes_before += len(original)
+                        bytes_after += len(normalized)
+                print(f"Recompressed up to id {last_id}", end='\r')
+        print("\n")
+
+        # Give the freed pages back to the file system
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    size_after = os.path.getsize(db_name)
+    logger.info("Recompressed %s images in '%s': %.1f MB -> %.1f MB of images, file %.1f MB -> %.1f MB",
+                rows_updated, db_name, bytes_before / 1024 / 1024, bytes_after / 1024 / 1024,
+                size_before / 1024 / 1024, size_after / 1024 / 1024)
@@ -0,0 +1,160 @@
+# Import libraries
+import logging
+import queue
+import sqlite3
+import threading
+from typing import Any, Callable, Optional
+
+# Import functions and classes from other modules of the app
+from db_operations import create_connection
+from metrics import metrics
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+# Control messages of the writer queue
+_FLUSH = object()
+_STOP = object()
+
+
+class IngestWriter:
+    """Owns the only write connection of a database. Producers of any thread submit records to a bounded queue,
+    the writer thread stores them in batched transactions"""
+
+    def __init__(self, database: str, write: Callable[[sqlite3.Connection, Any], None],
+                 batch_size: Optional[int] = None, max_queue: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
+        """The write function stores one record using the connection without committing."""
+        self.database = database
+        self.write = write
+        self.batch_size = batch_size or config["ingest"]["batch_size"]
+        self.flush_interval = flush_interval or config["ingest"]["flush_interval"]
+        # Bounded queue blocks producers when the writer falls behind
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue or config["ingest"]["max_queue"])
+        self.stored = 0
+        self.failed = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name=f"ingest-writer-{database}", daemon=True)
+        self.thread.start()
+
+    def __enter__(self) -> 'IngestWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def submit(self, record: Any, on_stored: Optional[Callable[[bool], None]] = None,
+               timeout: Optional[float] = None) -> None:
+        """Queue the record for writing. Blocks while the queue is full, raises queue.Full after the timeout.
+           on_stored is called by the writer thread with True after the record is committed, False on failure."""
+        if self.closed:
+            raise RuntimeError(f"Ingest writer of '{self.database}' is closed")
+        if self.queue.full():
+            metrics.inc("ingest_backpressure_waits")
+        self.queue.put((record, on_stored), timeout=timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all records submitted before the call are committed. Returns False on timeout."""
+        if self.closed:
+            raise RuntimeError(f"Ingest writer of '{self.database}' is closed")
+        done = threading.Event()
+        self.queue.put((_FLUSH, done.set))
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        """Commit the queued records and stop the writer thread."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put((_STOP, None))
+        self.thread.join()
+        logger.info("Ingest writer of '%s' closed: %s records stored, %s failed", self.database, self.stored,
+                    self.failed)
+
+    def _next_batch(self) -> tuple[list, list, bool]:
+        """Wait for a record, then collect more until the batch is full or the flush interval passes.
+           Returns records with their callbacks, flush callbacks and whether the writer should stop."""
+        records, flushes = [], []
+        timeout = None  # Wait without limit for the first message
+        while len(records) < self.batch_size:
+            try:
+                record, callback = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            timeout = self.flush_interval
+            if record is _STOP:
+                return records, flushes, True
+            if record is _FLUSH:
+                flushes.append(callback)
+                break
+            records.append((record, callback))
+        return records, flushes, False
+
+    def _run(self) -> None:
+        conn = create_connection(self.database)
+        if conn is None:
+            self._fail_all()
+            return
+        try:
+            stop = False
+            while not stop:
+                records, flushes, stop = self._next_batch()
+                if records:
+                    self._write_batch(conn, records)
+                for callback in flushes:
+                    callback()
+        finally:
+            conn.close()
+
+    def _fail_all(self) -> None:
+        """Without a connection, fail every record until the writer is closed, so producers are not blocked."""
+        logger.error("Ingest writer of '%s' has no database connection, records are not stored", self.database)
+        while True:
+            record, callback = self.queue.get()
+            if record is _STOP:
+                return
+            if record is _FLUSH:
+                callback()
+            else:
+                self._report(callback, False)
+
+    def _write_batch(self, conn: sqlite3.Connection, records: list) -> None:
+        """Store the records in one transaction. If it fails, store them one by one to isolate bad records."""
+        try:
+            with metrics.timer("ingest_batch"), conn:
+                for record, _ in records:
+                    self.write(conn, record)
+            results = [(callback, True) for _, callback in records]
+        except Exception:
+            logger.exception("Batch of %s records failed in '%s', writing them one by one", len(records),
+                             self.database)
+            results = []
+            for record, callback in records:
+                try:
+                    with conn:
+                        self.write(conn, record)
+                    results.append((callback, True))
+                except Exception:
+                    logger.exception("Record failed in '%s'", self.database)
+                    results.append((callback, False))
+
+        metrics.inc("ingest_batches")
+        metrics.inc("ingest_records", len(records))
+        for callback, ok in results:
+            self._report(callback, ok)
+
+    def _report(self, callback: Optional[Callable[[bool], None]], ok: bool) -> None:
+        """Count the result of the record and pass it to its callback."""
+        if ok:
+            self.stored += 1
+        else:
+            self.failed += 1
+        if callback:
+            try:
+                callback(ok)
+            except Exception:
+                logger.exception("Ingest callback failed")
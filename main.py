@@ -10,9 +10,14 @@ import logging.config
 logging.config.fileConfig('logging.ini')  # Load config file before import of other modules
 
 # Import functions and classes from other modules of the app
-from db_operations import initialize_database
+from db_operations import initialize_database, maintain_database
 from config_loader import Config
-import gui
+from metrics import export_run
+from profiling import profiled
+from image_processing import recompress_database, backfill_cover_hashes
+from html_archive import reextract_site
+from title_matching import match_movies
+import cli
 
 # Initialise logger
 logger = logging.getLogger(__name__)
@@ -24,31 +29,149 @@ config = Config().settings
 
 def parse_arguments() -> argparse.Namespace:
     """Parse arguments provided from command line"""
-    parser = argparse.ArgumentParser(description=config['gui']['app_description'])
-    parser.add_argument('mode', choices=['demo'], nargs='?', default=None, help='Run the program in demo mode')
-    parser.add_argument('demo_search_strings_epika', nargs='?', type=eval, default=config["demo"]["default_demo_search_strings_epika"],
-                        help='Optional list of search strings for Epika')
-    parser.add_argument('-b', '--show_browser', action='store_true', help='Show scraping action in browser if set')
-    return parser.parse_args()
+
+    # Options accepted both before and after the command, not set unless given
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-b', '--show_browser', action='store_true', default=argparse.SUPPRESS,
+                        help='Show scraping action in browser if set')
+    common.add_argument('--profile', action='store_true', default=argparse.SUPPRESS,
+                        help='Profile each query or scrape with cProfile')
+    common.add_argument('--trace-memory', action='store_true', default=argparse.SUPPRESS,
+                        help='Trace memory allocations of each query or scrape with tracemalloc')
+    common.add_argument('--demo', action='store_true', default=argparse.SUPPRESS,
+                        help='Use demo databases and limited scraping')
+
+    parser = argparse.ArgumentParser(description=config['gui']['app_description'], parents=[common])
+    parser.set_defaults(command=None, demo_search_strings_epika=config["demo"]["default_demo_search_strings_epika"])
+    subparsers = parser.add_subparsers(dest='command', title='commands',
+                                       description='Without command the graphical user interface is launched')
+
+    demo_parser = subparsers.add_parser('demo', parents=[common], help='Run the program in demo mode')
+    demo_parser.add_argument('demo_search_strings_epika', nargs='?', type=eval,
+                             default=config["demo"]["default_demo_search_strings_epika"],
+                             help='Optional list of search strings for Epika')
+
+    subparsers.add_parser('maintain', parents=[common],
+                          help='Analyze, vacuum and check integrity of databases, reporting their size')
+    subparsers.add_parser('recompress', parents=[common], help='Recompress images of existing databases')
+
+    scrape_parser = subparsers.add_parser('scrape', parents=[common], help='Scrape the site without GUI')
+    scrape_parser.add_argument('site', choices=['epika', 'mediateka'], help='Site to scrape')
+    scrape_parser.add_argument('--phase', choices=['shallow', 'deep', 'all'], default='all',
+                               help='Scrape phase to perform')
+
+    crawl_parser = subparsers.add_parser('crawl', parents=[common],
+                                         help='Deep scrape queued pages of both sites with parallel workers')
+    crawl_parser.add_argument('--sites', nargs='+', choices=['epika', 'mediateka'], default=['epika', 'mediateka'],
+                              help='Sites to crawl, their pages are interleaved')
+    crawl_parser.add_argument('--workers', type=int, default=config["crawl"]["workers"],
+                              help='Number of browser workers')
+
+    subparsers.add_parser('match', parents=[common], help='Link near-duplicate movies of both sites')
+
+    subparsers.add_parser('hash-covers', parents=[common], help='Compute missing cover hashes of existing movies')
+    covers_parser = subparsers.add_parser('similar-covers', parents=[common],
+                                          help='Find movies with similar covers, or all similar pairs without --id')
+    covers_parser.add_argument('--site', choices=['epika', 'mediateka'], default='epika', help='Site of the movie')
+    covers_parser.add_argument('--id', type=int, help='Movie id')
+    covers_parser.add_argument('--distance', type=int, default=config["images"]["similar_distance"],
+                               help='Maximal Hamming distance of cover hashes')
+    covers_parser.add_argument('--output', help='Output file, standard output if not set')
+
+    refresh_parser = subparsers.add_parser('refresh', parents=[common],
+                                           help='Mark disappeared and returned movies and deep scrape new ones')
+    refresh_parser.add_argument('site', choices=['epika', 'mediateka'], help='Site to refresh')
+
+    archive_parser = subparsers.add_parser('reextract', parents=[common],
+                                           help='Re-parse archived HTML pages and update databases offline')
+    archive_parser.add_argument('--sites', nargs='+', choices=['epika', 'mediateka'], default=['epika', 'mediateka'],
+                                help='Sites to re-extract')
+    archive_parser.add_argument('--workers', type=int, default=config["archive"]["workers"],
+                                help='Number of worker processes')
+
+    query_parser = subparsers.add_parser('query', parents=[common], help='Execute SQL query and export results')
+    query_parser.add_argument('sql', help='SQL query executed on both databases')
+    query_parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help='Output format')
+    query_parser.add_argument('--blobs', choices=['exclude', 'hex'], default='exclude',
+                              help='Exclude BLOB columns or write them hex-encoded')
+    query_parser.add_argument('--output', default=None, help='Output file, standard output if not set')
+    query_parser.add_argument('--chunk-size', type=int, default=config["cli"]["chunk_size"],
+                              help='Number of rows fetched at once')
+    # Defaults of common options are set on the namespace: set_defaults would change the actions shared with
+    # subparsers, which would then overwrite options given before the command
+    defaults = argparse.Namespace(show_browser=False, profile=False, trace_memory=False, demo=False)
+    return parser.parse_args(namespace=defaults)
+
 
 def main():
     args = parse_arguments()
 
-    if args.mode == 'demo':
+    # Demo command and --demo option of any command both enable demo mode
+    if args.command == 'demo' or args.demo:
         config['demo']['is_demo'] = True
         config['data']['epika'] = config['data']['epika_demo']
         config['data']['mediateka'] = config['data']['mediateka_demo']
+        config['crawl']['frontier'] = config['crawl']['frontier_demo']
+        config['archive']['directory'] = config['archive']['directory_demo']
         config['demo']['default_demo_search_strings_epika'] = args.demo_search_strings_epika
 
     if args.show_browser:
         config['scraping']['show_browser'] = True
 
+    if args.profile:
+        config['profiling']['profile'] = True
+
+    if args.trace_memory:
+        config['profiling']['trace_memory'] = True
+
     # Initialize both databases
     initialize_database(config["data"]["epika"])
     initialize_database(config["data"]["mediateka"])
 
-    # Run graphical user interface
-    gui.run_gui()
+    try:
+        if args.command == 'maintain':
+            with profiled("maintain"):
+                maintain_database(config["data"]["epika"])
+                maintain_database(config["data"]["mediateka"])
+        elif args.command == 'recompress':
+            with profiled("recompress"):
+                recompress_database(config["data"]["epika"])
+                recompress_database(config["data"]["mediateka"])
+        elif args.command == 'scrape':
+            with profiled(f"scrape_{args.site}_{args.phase}"):
+                cli.run_scrape(args.site, args.phase)
+        elif args.command == 'hash-covers':
+            with profiled("hash_covers"):
+                backfill_cover_hashes(config["data"]["epika"])
+                backfill_cover_hashes(config["data"]["mediateka"])
+        elif args.command == 'similar-covers':
+            with profiled("similar_covers"):
+                cli.run_similar_covers(args.site, args.id, args.distance, args.output)
+        elif args.command == 'match':
+            with profiled("match"):
+                match_movies()
+        elif args.command == 'refresh':
+            with profiled(f"refresh_{args.site}"):
+                cli.run_refresh(args.site)
+        elif args.command == 'crawl':
+            with profiled("crawl"):
+                cli.run_crawl(args.sites, args.workers)
+        elif args.command == 'reextract':
+            with profiled("reextract"):
+                for site in args.sites:
+                    reextract_site(site, args.workers)
+        elif args.command == 'query':
+            with profiled("query"):
+                cli.run_query(args.sql, [config["data"]["epika"], config["data"]["mediateka"]], args.format,
+                              args.blobs, args.chunk_size, args.output)
+        else:
+            # Run graphical user interface, imported only when needed
+            import gui
+            gui.run_gui()
+    finally:
+        # Write the metrics of the run
+        export_run()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,146 @@
+# Import libraries
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Iterator
+
+# Import functions and classes from other modules of the app
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+# Upper bounds of latency histogram buckets in seconds
+DEFAULT_BUCKETS: tuple[float, ...] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Latency histogram with cumulative buckets as used by Prometheus"""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.bucket_counts)},
+        }
+
+
+class MetricsRegistry:
+    """Collects counters and latency histograms of the app stages during one run"""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        """Increase the counter by amount."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record the duration of one call of the stage."""
+        with self._lock:
+            self.histograms.setdefault(name, Histogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Context manager that records the duration of the block and counts errors raised in it."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(f"{name}_errors")
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str) -> Callable:
+        """A decorator that records the duration of every call of a function."""
+        def _decorator(f):
+            @wraps(f)
+            def _inner(*args, **kwargs):
+                with self.timer(name):
+                    return f(*args, **kwargs)
+            return _inner
+        return _decorator
+
+    def summary(self) -> dict:
+        """Return all metrics as a dictionary."""
+        with self._lock:
+            return {
+                "started_at": self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+                "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+    def write_json(self, filename: str) -> None:
+        """Write the summary of the run to a JSON file."""
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2)
+        logger.info("Metrics summary written to '%s'", filename)
+
+    def write_prometheus(self, filename: str) -> None:
+        """Write metrics to a file in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE media_sql_{name}_total counter")
+                lines.append(f"media_sql_{name}_total {value}")
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f"media_sql_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.sum}")
+                lines.append(f"{metric}_count {histogram.count}")
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write("\n".join(lines) + "\n")
+        logger.info("Prometheus metrics written to '%s'", filename)
+
+
+# Registry shared by all modules of the app
+metrics = MetricsRegistry()
+
+
+def export_run() -> None:
+    """Write the metrics of the current run to the directory set in config."""
+    if not metrics.counters and not metrics.histograms:
+        return
+    directory = config["metrics"]["directory"]
+    os.makedirs(directory, exist_ok=True)
+    timestamp = metrics.started_at.strftime("%Y%m%d_%H%M%S")
+    metrics.write_json(os.path.join(directory, f"metrics_{timestamp}.json"))
+    if config["metrics"]["prometheus"]:
+        metrics.write_prometheus(os.path.join(directory, config["metrics"]["prometheus_file"]))
@@ -0,0 +1,145 @@
+# Parsing of movie page content shared by live scraping and offline re-extraction from the HTML archive
+# The module does not import Selenium, so process pool workers stay light
+
+# Import libraries
+import re
+from html.parser import HTMLParser
+from typing import Optional
+
+# Import functions and classes from other modules of the app
+from config_loader import LargeStrings
+
+# HTML elements that have no closing tag
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+# HTML elements that separate words of rendered text
+BLOCK_ELEMENTS = {"br", "div", "p", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def parse_epika_metadata(texts: list[str]) -> tuple[Optional[int], Optional[int], str]:
+    """Parse texts of epika.lrt.lt metadata elements into release year, duration in minutes and genre."""
+    release_year = None
+    total_minutes = None
+    genre = []
+
+    for text in texts:
+        text = text.strip()
+
+        if text.isdigit() and len(text) == 4:
+            release_year = int(text)
+        elif re.match(r'(?:(\d+)h\s*)?(\d+)m', text):
+            match = re.match(r'(?:(\d+)h\s*)?(\d+)m', text)
+            hours, minutes = map(lambda x: int(x) if x else 0, match.groups())
+            total_minutes = hours * 60 + minutes
+        else:
+            genre.append(text)
+
+    return release_year, total_minutes, ', '.join(genre)
+
+
+def parse_mediateka_description(description: str) -> tuple[Optional[str], Optional[int]]:
+    """Find genre and release year mentioned in lrt.lt/tema/filmai movie description."""
+    genre = None
+
+    # Look in the description if genre is mentioned
+    all_text_lower = description.lower()
+    for genre_candidate in LargeStrings.list_of_genres_mediateka:
+        if genre_candidate in all_text_lower:
+            genre = genre_candidate
+            break
+
+    # Search for release year in the format '2018 m.'
+    year_match = re.search(r'\b(\d{4})\s*m\.', all_text_lower)
+    release_year = int(year_match.group(1)) if year_match else None
+
+    return genre, release_year
+
+
+def parse_views_count(text: str) -> Optional[int]:
+    """Convert views text of lrt.lt/tema/filmai listing to a number."""
+    return int(text) if text.isdigit() else None
+
+
+class SelectorTextParser(HTMLParser):
+    """Collects text of elements matched by simple 'tag.class' or '.class' selectors, optionally inside an ancestor
+    selector"""
+
+    def __init__(self, selectors: dict[str, tuple[Optional[str], str]]):
+        """Selectors map a name to (ancestor selector or None, element selector)."""
+        super().__init__(convert_charrefs=True)
+        self.selectors = {name: (self._parse(ancestor) if ancestor else None, self._parse(element))
+                          for name, (ancestor, element) in selectors.items()}
+        self.results: dict[str, list[str]] = {name: [] for name in selectors}
+        self.stack: list[tuple[str, set[str]]] = []
+        self.open: list[tuple[str, int, list[str]]] = []  # Collected elements: name, stack depth, text parts
+
+    @staticmethod
+    def _parse(selector: str) -> tuple[str, set[str]]:
+        tag, *classes = selector.split(".")
+        return tag, set(classes)
+
+    @staticmethod
+    def _matches(element: tuple[str, set[str]], selector: tuple[str, set[str]]) -> bool:
+        return (not selector[0] or element[0] == selector[0]) and selector[1] <= element[1]
+
+    def handle_starttag(self, tag, attrs):
+        classes = set((dict(attrs).get("class") or "").split())
+        element = (tag, classes)
+        if self.open and tag in BLOCK_ELEMENTS:
+            self.open[-1][2].append(" ")
+        if tag in VOID_ELEMENTS:
+            return
+        self.stack.append(element)
+        for name, (ancestor, selector) in self.selectors.items():
+            if self._matches(element, selector) and (
+                    ancestor is None or any(self._matches(parent, ancestor) for parent in self.stack[:-1])):
+                self.open.append((name, len(self.stack), []))
+
+    def handle_endtag(self, tag):
+        if self.open and tag in BLOCK_ELEMENTS:
+            self.open[-1][2].append(" ")
+        if tag in VOID_ELEMENTS or not any(element[0] == tag for element in self.stack):
+            return
+        # Close unclosed inner elements together with the element
+        while self.stack:
+            element = self.stack.pop()
+            while self.open and self.open[-1][1] > len(self.stack):
+                name, _, parts = self.open.pop()
+                self.results[name].append(" ".join("".join(parts).split()))
+                if self.open:
+                    self.open[-1][2].extend(parts)
+            if element[0] == tag:
+                break
+
+    def handle_data(self, data):
+        if self.open:
+            self.open[-1][2].append(data)
+
+
+def select_texts(html: str, selectors: dict[str, tuple[Optional[str], str]]) -> dict[str, list[str]]:
+    """Return texts of elements matched by each selector."""
+    parser = SelectorTextParser(selectors)
+    parser.feed(html)
+    parser.close()
+    return parser.results
+
+
+def extract_epika_page(html: str) -> dict:
+    """Extract movie fields from HTML of epika.lrt.lt movie page."""
+    texts = select_texts(html, {
+        "metadata": ("div.metadata__product-meta", "span.metadata__product-meta-element"),
+        "description": (None, "div.metadata-content__description"),
+    })
+    release_year, duration, genre = parse_epika_metadata(texts["metadata"])
+    return {"description": texts["description"][0] if texts["description"] else None,
+            "release_year": release_year, "duration": duration, "genre": genre or None}
+
+
+def extract_mediateka_page(html: str) -> dict:
+    """Extract movie fields from HTML of lrt.lt/tema/filmai movie page."""
+    texts = select_texts(html, {
+        "paragraphs": (".article-content.article-content--sm.mt-16.js-text-selection", "p"),
+    })
+    description = ' '.join(texts["paragraphs"])
+    genre, release_year = parse_mediateka_description(description)
+    return {"description": description or None, "release_year": release_year, "genre": genre}
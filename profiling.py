@@ -0,0 +1,107 @@
+# Import libraries
+import cProfile
+import io
+import logging
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+# Import functions and classes from other modules of the app
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+
+class ProfileReport:
+    """Holds the result of one profiled action"""
+
+    def __init__(self, action: str):
+        self.action = action
+        self.filename: str | None = None
+        self.hotspots: list[str] = []
+        self.allocations: list[str] = []
+        self.peak_memory: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.filename is not None
+
+    def summary(self) -> str:
+        """Return short text summary of top hotspots and allocation sites."""
+        lines = [f"Profile of '{self.action}' written to '{self.filename}'"]
+        if self.hotspots:
+            lines += ["", "Top hotspots (cumulative time):"] + self.hotspots
+        if self.peak_memory is not None:
+            lines += ["", f"Peak traced memory: {self.peak_memory / 1024 / 1024:.1f} MB", "Top allocation sites:"]
+            lines += self.allocations
+        return "\n".join(lines)
+
+
+def _format_hotspots(stats: pstats.Stats, top_n: int) -> list[str]:
+    """Return the lines of top functions by cumulative time."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top_n]
+    lines = []
+    for (filename, line, function), (_, ncalls, _, cumtime, _) in rows:
+        lines.append(f"{cumtime:10.3f} s {ncalls:>9} calls  {os.path.basename(filename)}:{line}({function})")
+    return lines
+
+
+@contextmanager
+def profiled(action: str) -> Iterator[ProfileReport]:
+    """Run the block with cProfile and/or tracemalloc when enabled in config and write the report to log/."""
+    report = ProfileReport(action)
+    profile_cpu = config["profiling"]["profile"]
+    trace_memory = config["profiling"]["trace_memory"]
+    if not profile_cpu and not trace_memory:
+        yield report
+        return
+
+    top_n = config["profiling"]["top_n"]
+    profiler = cProfile.Profile() if profile_cpu else None
+    # Tracing started by an outer block or another user is left running
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield report
+    finally:
+        if profiler:
+            profiler.disable()
+        snapshot = None
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, report.peak_memory = tracemalloc.get_traced_memory()
+            if start_tracing:
+                tracemalloc.stop()
+
+        directory = config["profiling"]["directory"]
+        os.makedirs(directory, exist_ok=True)
+        # Microseconds keep reports of actions finished in the same second apart
+        name = f"profile_{action}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        report.filename = os.path.join(directory, f"{name}.txt")
+
+        with open(report.filename, 'w', encoding='utf-8') as file:
+            file.write(f"Action: {action}\n\n")
+            if profiler:
+                profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+                stream = io.StringIO()
+                stats = pstats.Stats(profiler, stream=stream)
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(config["profiling"]["report_lines"])
+                report.hotspots = _format_hotspots(stats, top_n)
+                file.write(stream.getvalue())
+            if snapshot:
+                file.write(f"\nPeak traced memory: {report.peak_memory / 1024 / 1024:.1f} MB\n")
+                file.write("Top allocation sites:\n")
+                for stat in snapshot.statistics('lineno')[:top_n]:
+                    report.allocations.append(f"{stat.size / 1024:10.1f} KiB {stat.count:>9} blocks  {stat.traceback}")
+                file.write("\n".join(report.allocations) + "\n")
+        logger.info("Profile of '%s' written to '%s'", action, report.filename)
@@ -11,12 +11,16 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.remote.remote_connection import LOGGER
 import logging
 import requests
-from typing import Optional, Any
+from typing import Optional, Any, Iterator, Callable
 import time
-import re
+from functools import partial
 
 # Import functions and classes from other modules of the app
 from config_loader import Config, LargeStrings
+from metrics import metrics
+from frontier import CrawlScheduler, FrontierItem
+from page_parsing import parse_epika_metadata, parse_mediateka_description, parse_views_count
+from html_archive import HtmlArchive
 
 # Create a logger
 logger = logging.getLogger(__name__)
@@ -84,6 +88,13 @@ def load_lazy_content(driver, scroll_step=config["scraping"]["lazy_scroll_step"]
     time.sleep(wait_time)
 
 
+@metrics.timed("page_navigation")
+def open_page(driver: webdriver.Chrome, url: str) -> None:
+    """Open the web page in the browser"""
+    driver.get(url)
+
+
+@metrics.timed("image_download")
 def read_image_from_url(url: str) -> Optional[bytes]:
     """Download an image from a URL and return it as a binary blob"""
 
@@ -92,16 +103,17 @@ def read_image_from_url(url: str) -> Optional[bytes]:
         response.raise_for_status()
         return response.content
     except requests.RequestException as e:
+        metrics.inc("image_download_errors")
         logger.warning("Error while fetching the image: %s", e)
         return None
 
 
-def shallow_scrape_epika(driver: webdriver.Chrome) -> list[tuple[str, str, str]]:
-    """Scrape epika.lrt.lt page for media information based on the list of search strings."""
+def shallow_scrape_epika(driver: webdriver.Chrome, scheduler: CrawlScheduler) -> list[tuple[str, str, str]]:
+    """Scrape epika.lrt.lt search pages taken from the crawl frontier for media information."""
 
     logging.info("Starting shallow scraping...")
     # Open web page for the first time and accept the cookies
-    driver.get("https://epika.lrt.lt/search")
+    open_page(driver, "https://epika.lrt.lt/search")
     accept_cookies(driver)
     logging.info("Cookies accepted")
 
@@ -114,13 +126,21 @@ def shallow_scrape_epika(driver: webdriver.Chrome) -> list[tuple[str, str, str]]
     else:
         list_search_strings_epika = LargeStrings.list_search_strings_epika
 
-    # Loop through all search strings
-    for ind, search_string in enumerate(list_search_strings_epika, start=1):
-        logging.info("Shallow scraping - page %s of %s", ind, len(LargeStrings.list_search_strings_epika))
+    # Queue search pages of all search strings
+    scheduler.frontier.add([(f"https://epika.lrt.lt/search?q={search_string}", None)
+                            for search_string in list_search_strings_epika], "epika", "shallow", requeue=True)
+
+    # Loop through search pages as the scheduler allows
+    for ind, item in enumerate(scheduler, start=1):
+        logging.info("Shallow scraping - page %s of %s", ind, len(list_search_strings_epika))
         counter_str_used = 0  # To count additions in relation to search string
+        title_blocks: list[WebElement] = []
+        response_time = 0.0
         try:
             # Open the webpage
-            driver.get(f"https://epika.lrt.lt/search?q={search_string}")
+            start = time.perf_counter()
+            open_page(driver, item.url)
+            response_time = time.perf_counter() - start
 
             time.sleep(2)  # Allow to load whole body of the page
 
@@ -128,113 +148,86 @@ def shallow_scrape_epika(driver: webdriver.Chrome) -> list[tuple[str, str, str]]
             load_lazy_content(driver)
 
             # Find all media blocks
-            title_blocks: list[WebElement] = driver.find_elements(By.CSS_SELECTOR, ".tile--vod.tile")
+            title_blocks = driver.find_elements(By.CSS_SELECTOR, ".tile--vod.tile")
             logging.info("Found %s movie title. Extracting...", len(title_blocks))
 
-            for i, block in enumerate(title_blocks):
-                try:
-                    # Extract title, link to page, and link to image
-                    movie_title = block.find_element(By.CSS_SELECTOR, ".headline-4.tile__title").text
-                    link_to_page = block.find_element(By.CLASS_NAME, "tile__link").get_attribute("href")
-                    link_to_image = block.find_element(By.CLASS_NAME, "cover").get_attribute("src")
-                    print("." * i, end='\r')
-
-                    # No way further with this movie, if one element is missing
-                    assert movie_title is not None, "Movie title is None"
-                    assert link_to_page is not None, "Link to page is None"
-                    assert link_to_image is not None, "Link to image is None"
-                    # Check if the movie title is already in the list
-                    if not any(link_to_page == existing_url for _, existing_url, _ in list_of_movies):
-                        # Add the tuple to the list
-                        counter_str_used += 1
-                        list_of_movies.append((movie_title, link_to_page, link_to_image))
-
-                except NoSuchElementException as err:
-                    logging.warning("Element not found: %s", err)
+            with metrics.timer("dom_extraction"):
+                for i, block in enumerate(title_blocks):
+                    try:
+                        # Extract title, link to page, and link to image
+                        movie_title = block.find_element(By.CSS_SELECTOR, ".headline-4.tile__title").text
+                        link_to_page = block.find_element(By.CLASS_NAME, "tile__link").get_attribute("href")
+                        link_to_image = block.find_element(By.CLASS_NAME, "cover").get_attribute("src")
+                        print("." * i, end='\r')
+
+                        # No way further with this movie, if one element is missing
+                        assert movie_title is not None, "Movie title is None"
+                        assert link_to_page is not None, "Link to page is None"
+                        assert link_to_image is not None, "Link to image is None"
+                        # Check if the movie title is already in the list
+                        if not any(link_to_page == existing_url for _, existing_url, _ in list_of_movies):
+                            # Add the tuple to the list
+                            counter_str_used += 1
+                            list_of_movies.append((movie_title, link_to_page, link_to_image))
+
+                    except NoSuchElementException as err:
+                        logging.warning("Element not found: %s", err)
 
         except Exception:
-            logging.exception(f"An error occurred while processing '{search_string}'.", search_string)
+            logging.exception("An error occurred while processing '%s'.", item.url)
+            scheduler.report(item, response_time, ok=False)
+            continue
 
-        print(f'\nString: "{search_string}" | Returns: {len(title_blocks)} | Used: {counter_str_used}\n\n')
-        time.sleep(2)  # Make pause between scraping next page
+        scheduler.report(item, response_time, ok=True)
+        print(f'\nPage: "{item.url}" | Returns: {len(title_blocks)} | Used: {counter_str_used}\n\n')
 
     logging.info("Shallow scraping finished.")
     return list_of_movies
 
 
-def deep_scrape_epika(driver: webdriver.Chrome, list_of_movies: list[tuple[str, str, str]]) -> list[
-    tuple[str, bytes, str, int, int, str, str]]:
-    """Scrape epika.lrt.lt particular movie page for additional information of the movie."""
+def scrape_epika_movie(driver: webdriver.Chrome, movie: tuple[str, str, str]) -> tuple[
+        tuple[str, Optional[bytes], str, int, int, str, str], bool]:
+    """Scrape opened epika.lrt.lt particular movie page for additional information of the movie.
+       Returns movie data and whether all of it was found."""
 
-    logging.info("Starting deep scraping...")
-    # Open web page for the first time and accept the cookies
-    driver.get("https://epika.lrt.lt/search")
-    time.sleep(2)
-    accept_cookies(driver)
-    logging.info("Cookies accepted")
+    # Initialize variables
+    release_year = None
+    genre = ""
+    total_minutes = None
 
-    # Initialize the list of movie data for return as function result
-    # Tuple structure: <title, image, description, release year, duration, genre, page url>
-    list_of_movie_data: list[tuple[str, Optional[bytes], str, int, int, str, str]] = []
-
-    for ind, movie in enumerate(list_of_movies, start=1):
-        print(f"Scraping {ind} of {len(list_of_movies)}", end='\r')
+    with metrics.timer("dom_extraction"):
         try:
-            driver.get(f"{movie[1]}")
-            time.sleep(1)  # Allow the page to load
-
-            # Initialize variables
-            release_year = None
-            genre = []
-            total_minutes = None
-
-            try:
-                metadata_container = driver.find_element(By.CSS_SELECTOR, 'div.metadata__product-meta')
-                metadata_elements = metadata_container.find_elements(By.CSS_SELECTOR,
-                                                                     'span.metadata__product-meta-element')
-
-                for element in metadata_elements:
-                    text = element.text.strip()
-
-                    if text.isdigit() and len(text) == 4:
-                        release_year = int(text)
-                    elif re.match(r'(?:(\d+)h\s*)?(\d+)m', text):
-                        match = re.match(r'(?:(\d+)h\s*)?(\d+)m', text)
-                        hours, minutes = map(lambda x: int(x) if x else 0, match.groups())
-                        total_minutes = hours * 60 + minutes
-                    else:
-                        genre.append(text)
-
-                genre = ', '.join(genre)
-
-            except Exception as e:
-                logging.warning("Error extracting metadata: %s", e)
-
-            try:
-                description = driver.find_element(By.CSS_SELECTOR, 'div.metadata-content__description').text.strip()
-            except NoSuchElementException as err:
-                logging.warning("Description not found: %s", err)
-                description = ""
+            metadata_container = driver.find_element(By.CSS_SELECTOR, 'div.metadata__product-meta')
+            metadata_elements = metadata_container.find_elements(By.CSS_SELECTOR,
+                                                                 'span.metadata__product-meta-element')
+            release_year, total_minutes, genre = parse_epika_metadata([element.text for element in metadata_elements])
 
-            image = read_image_from_url(movie[2])
+        except Exception as e:
+            logging.warning("Error extracting metadata: %s", e)
 
-            # Append the movie data to the list
-            list_of_movie_data.append((movie[0], image, description, release_year, total_minutes, genre, movie[1]))
+        try:
+            description = driver.find_element(By.CSS_SELECTOR, 'div.metadata-content__description').text.strip()
+        except NoSuchElementException as err:
+            logging.warning("Description not found: %s", err)
+            description = ""
 
-            # Assertions
-            assert release_year is not None, "Release year is None"
-            assert genre != "", "Genre is None"
-            assert total_minutes is not None, "Duration is None"
-            assert description != "", "Description is None"
-            assert image is not None, "Image is None"
+    image = read_image_from_url(movie[2])
 
-        except Exception as e:
-            logging.info("Element not found '%s': %s", movie[0], e)
+    # Tuple structure: <title, image, description, release year, duration, genre, page url>
+    movie_data = (movie[0], image, description, release_year, total_minutes, genre, movie[1])
 
-        time.sleep(1)  # Pause between scraping pages
+    # Assertions
+    try:
+        assert release_year is not None, "Release year is None"
+        assert genre != "", "Genre is None"
+        assert total_minutes is not None, "Duration is None"
+        assert description != "", "Description is None"
+        assert image is not None, "Image is None"
+    except AssertionError as e:
+        logging.info("Element not found '%s': %s", movie[0], e)
+        return movie_data, False
 
-    logging.info("Deep scraping finished.")
-    return list_of_movie_data
+    return movie_data, True
 
 
 def accept_cookies_mediateka(driver: webdriver.Chrome) -> None:
@@ -302,95 +295,165 @@ def convert_duration_to_minutes(duration_str: str) -> int | None | Any:
     return None
 
 
-def shallow_scrape_mediateka(driver: webdriver.Chrome) -> list[tuple[str, str, str, str, str]]:
-    """Scrape lrt.lt/tema/filmai page for media information."""
+def extract_news_block(block: WebElement) -> Optional[tuple[str, str, str, str, str]]:
+    """Extract title, link, image link, duration and views of lrt.lt/tema/filmai news block.
+       Returns None if the block is not a movie."""
+
+    # Check if the specific icon element exists, skip if it does - not movie
+    if block.find_elements(By.CSS_SELECTOR, "svg.svg-icon.badge-light") or block.find_elements(By.CSS_SELECTOR,
+                                                                                               "i.icon.icon"
+                                                                                               "-photo"):
+        return None
+
+    # Extract the title and link
+    title_element = block.find_element(By.CSS_SELECTOR, "h3.news__title a")
+    title = title_element.text
+    link = title_element.get_attribute("href")
+
+    # Extract image link
+    image_link = block.find_element(By.CSS_SELECTOR, ".media-block__image").get_attribute(
+        "src")
+
+    # Extract the duration
+    duration = block.find_element(By.CLASS_NAME, "media-block__duration").text if block.find_elements(
+        By.CLASS_NAME, "media-block__duration") else "None"
+
+    # Extract the count of views
+    views = block.find_element(By.CSS_SELECTOR,
+                               ".badge-list.media-block__badge-list .badge.badge-light > span:last-child").text if block.find_elements(
+        By.CSS_SELECTOR, ".badge-list.media-block__badge-list .badge.badge-light > span:last-child") else "None"
+
+    # Check if both duration and views do not exist, skip - not a movie
+    if duration == 'None' and views == 'None':
+        return None
+
+    return title, link, image_link, duration, views
+
+
+def click_load_more(driver: webdriver.Chrome) -> bool:
+    """Click lrt.lt/tema/filmai "Load more" button. Returns False if there is no button."""
+
+    try:
+        load_more_button = driver.find_element(By.XPATH, '//a[@class="btn btn--lg section__button"]')
+        load_more_button.click()
+        return True
+    except (NoSuchElementException, ElementNotInteractableException):
+        logging.info("No more 'Load more' buttons.")
+        return False
+
+
+def harvest_mediateka(driver: webdriver.Chrome, is_known: Optional[Callable[[str], bool]]) -> list[
+        tuple[str, str, str, str, str]]:
+    """Extract new news blocks after each "Load more" click and remove them from the page to keep it small.
+       Stops after configured number of consecutive movies already known to the database."""
+
+    media_info = []
+    known_in_row = 0
+    i = 0
+    while True:
+        time.sleep(1)  # Wait for the page to load more content
+        load_lazy_content(driver)
+
+        # Extract blocks loaded by the last click, processed blocks are already removed from the page
+        with metrics.timer("dom_extraction"):
+            news_blocks = driver.find_elements(By.CLASS_NAME, "news")
+            for block in news_blocks:
+                movie = extract_news_block(block)
+                if movie is None:
+                    continue
+                media_info.append(movie)
+                known_in_row = known_in_row + 1 if is_known and is_known(movie[1]) else 0
+            driver.execute_script("arguments[0].forEach(function (block) { block.remove(); });", news_blocks)
+        logging.info("Blocks processed: %s, movies found: %s", len(news_blocks), len(media_info))
+
+        if known_in_row >= config["scraping"]["known_urls_stop"]:
+            logging.info("%s known movies in a row. Stopping.", known_in_row)
+            break
+        if not click_load_more(driver):
+            break
+        i += 1
+        logging.info(f"Load more button clicked {i} times")
+        # Don't scrape entire page if app is in demo mode
+        if config["demo"]["is_demo"] and i == config["demo"]["num_demo_pages_mediateka"]:
+            break
+
+    return media_info
+
+
+def shallow_scrape_mediateka(driver: webdriver.Chrome, scheduler: CrawlScheduler,
+                             is_known: Optional[Callable[[str], bool]] = None) -> list[
+        tuple[str, str, str, str, str]]:
+    """Scrape lrt.lt/tema/filmai page taken from the crawl frontier for media information.
+       In incremental mode is_known tells which movie urls are already in the database."""
 
     logging.info("Starting shallow scraping...")
 
+    # Queue the listing page and wait until the scheduler allows to open it
+    scheduler.frontier.add([("https://www.lrt.lt/tema/filmai", None)], "mediateka", "shallow", requeue=True)
+    item = scheduler.next_item()
+    if item is None:
+        logging.info("Listing page is not eligible for scraping.")
+        return []
+
+    response_time = 0.0
     try:
         # Open the webpage
-        driver.get("https://www.lrt.lt/tema/filmai")
+        start = time.perf_counter()
+        open_page(driver, item.url)
+        response_time = time.perf_counter() - start
         time.sleep(4)  # Allow cookie consent to appear
         accept_cookies_mediateka(driver)
         time.sleep(1)  # Wait for the page to load more content
         logging.info("Starting downloading web content...")
 
-        i = 0
-        while True:
-            try:
+        if config["scraping"]["incremental_mediateka"]:
+            media_info = harvest_mediateka(driver, is_known)
+        else:
+            i = 0
+            while True:
                 # Easy scroll the page to the bottom to download its content
                 time.sleep(1)  # Wait for the page to load more content
                 load_lazy_content(driver)
                 # Find and click the "Load More" button
-                load_more_button = driver.find_element(By.XPATH, '//a[@class="btn btn--lg section__button"]')
-                load_more_button.click()
+                if not click_load_more(driver):
+                    break
                 i += 1
                 logging.info(f"Load more button clicked {i} times")
                 # Don't scrape entire page if app is in demo mode
                 if config["demo"]["is_demo"] and i == config["demo"]["num_demo_pages_mediateka"]:
                     break
 
-            except (NoSuchElementException, ElementNotInteractableException):
-                logging.info("No more 'Load more' buttons.")
-                break
-
-        # Find all media blocks
-        news_blocks = driver.find_elements(By.CLASS_NAME, "news")
-        logging.info("Blocks loaded: %s", len(news_blocks))
-
-        # Initialize a list to store the tuples for return as function result
-        media_info = []
-
-        # Loop through each news block
-        for ind, block in enumerate(news_blocks):
-            print(f"Processing block: {ind + 1}", end='\r')
-
-            # Check if the specific icon element exists, skip if it does - not movie
-            if block.find_elements(By.CSS_SELECTOR, "svg.svg-icon.badge-light") or block.find_elements(By.CSS_SELECTOR,
-                                                                                                       "i.icon.icon"
-                                                                                                       "-photo"):
-                continue
-
-            # Extract the title and link
-            title_element = block.find_element(By.CSS_SELECTOR, "h3.news__title a")
-            title = title_element.text
-            link = title_element.get_attribute("href")
-
-            # Extract image link
-            image_link = block.find_element(By.CSS_SELECTOR, ".media-block__image").get_attribute(
-                "src")
-
-            # Extract the duration
-            duration = block.find_element(By.CLASS_NAME, "media-block__duration").text if block.find_elements(
-                By.CLASS_NAME, "media-block__duration") else "None"
-
-            # Extract the count of views
-            views = block.find_element(By.CSS_SELECTOR,
-                                       ".badge-list.media-block__badge-list .badge.badge-light > span:last-child").text if block.find_elements(
-                By.CSS_SELECTOR, ".badge-list.media-block__badge-list .badge.badge-light > span:last-child") else "None"
-
-            # Check if both duration and views do not exist, skip - not a movie
-            if duration == 'None' and views == 'None':
-                continue
-
-            # Add the tuple to the list
-            media_info.append((title, link, image_link, duration, views))
+            # Find all media blocks
+            news_blocks = driver.find_elements(By.CLASS_NAME, "news")
+            logging.info("Blocks loaded: %s", len(news_blocks))
+
+            # Initialize a list to store the tuples for return as function result
+            media_info = []
+
+            with metrics.timer("dom_extraction"):
+                # Loop through each news block
+                for ind, block in enumerate(news_blocks):
+                    print(f"Processing block: {ind + 1}", end='\r')
+                    movie = extract_news_block(block)
+                    if movie:
+                        # Add the tuple to the list
+                        media_info.append(movie)
 
         print("\n")
+        scheduler.report(item, response_time, ok=True)
         logging.info("Shallow scraping finished.")
         return media_info
 
     except Exception:
         logging.exception("An error occurred during scraping")
+        scheduler.report(item, response_time, ok=False)
         return []
 
 
-def deep_scrape_mediateka(
-        driver: webdriver.Chrome, list_of_movies: list[tuple[str, str, str, str, str]]
-) -> list[tuple[str, Optional[bytes], str, int, int, str, str, int]]:
-    """Scrape lrt.lt/tema/filmai particular movie page for movie information."""
-
-    logging.info("Starting deep scraping...")
+def scrape_mediateka_movie(driver: webdriver.Chrome, movie: tuple[str, str, str, str, str], ind: int) -> tuple[
+        tuple[str, Optional[bytes], str, int, int, str, str, int], bool]:
+    """Scrape opened lrt.lt/tema/filmai particular movie page for movie information.
+       Returns movie data and whether all of it was found."""
 
     # JavaScript to pause the video
     pause_video_script = """
@@ -400,69 +463,109 @@ def deep_scrape_mediateka(
     }
     """
 
-    # Open web page for the first time and accept the cookies
-    driver.get("https://www.lrt.lt/tema/filmai")
-    time.sleep(4)  # Allow cookie consent to download
-    accept_cookies_mediateka(driver)
+    driver.execute_script(pause_video_script)
+    time.sleep(1)
+    click_optional_buttons(driver, ind)
+
+    # Initialize variables
+    description = genre = image = duration = views = None
+
+    with metrics.timer("dom_extraction"):
+        # Extract description
+        paragraph_elements = driver.find_elements(By.CSS_SELECTOR,
+                                                  ".article-content.article-content--sm.mt-16.js-text"
+                                                  "-selection p")
+        description = ' '.join([element.text for element in paragraph_elements])
+
+        # Look in the description if genre and release year are mentioned
+        genre, release_year = parse_mediateka_description(description)
 
-    # Initialize the list of movie data for return as function result
+    image = read_image_from_url(movie[2])
+    duration = convert_duration_to_minutes(movie[3])
+    views = parse_views_count(movie[4])
+
+    print(
+        f"Title: {movie[0]} | Description: {description[:20]} | Release year: {release_year} | Genre: {genre} | Duration: {duration} | Views: {views}\n")
     # Tuple structure: <title, image, description, release year, duration, genre, page url, views>
-    list_of_movie_data: list[tuple[str, Optional[bytes], str, int, int, str, str, int]] = []
+    movie_data = (movie[0], image, description, release_year, duration, genre, movie[1], views)
 
-    for ind, movie in enumerate(list_of_movies, start=1):
-        logging.info("Scraping %s of %s", ind, len(list_of_movies))
-        try:
-            driver.get(f"{movie[1]}")
-            time.sleep(2)  # Allow the page to load
-            driver.execute_script(pause_video_script)
-            time.sleep(1)
-            click_optional_buttons(driver, ind)
+    try:
+        assert description is not None, "Description is None"
+        assert release_year is not None, "Release year is None"
+        assert genre is not None, "Genre is None"
+        assert image is not None, "Image is None"
+        assert duration is not None, "Duration is None"
+        assert views is not None, "Views is None"
+    except AssertionError as e:
+        logging.info("Element not found extracting description: %s", e)
+        return movie_data, False
+
+    return movie_data, True
+
+
+def open_site(driver: webdriver.Chrome, site: str) -> None:
+    """Open the start page of the site for the first time and accept the cookies"""
+
+    if site == "epika":
+        open_page(driver, "https://epika.lrt.lt/search")
+        time.sleep(2)
+        accept_cookies(driver)
+    else:
+        open_page(driver, "https://www.lrt.lt/tema/filmai")
+        time.sleep(4)  # Allow cookie consent to download
+        accept_cookies_mediateka(driver)
+    logging.info("Cookies accepted")
 
-            # Initialize variables
-            description = genre = image = duration = views = None
 
-            try:
-                # Extract description
-                paragraph_elements = driver.find_elements(By.CSS_SELECTOR,
-                                                          ".article-content.article-content--sm.mt-16.js-text"
-                                                          "-selection p")
-                description = ' '.join([element.text for element in paragraph_elements])
-
-                # Look in the description if genre is mentioned
-                all_text_lower = description.lower()
-                for genre_candidate in LargeStrings.list_of_genres_mediateka:
-                    if genre_candidate in all_text_lower:
-                        genre = genre_candidate
-                        break
-
-                # Search for release year in the format '2018 m.'
-                year_match = re.search(r'\b(\d{4})\s*m\.', all_text_lower)
-                release_year = int(year_match.group(1)) if year_match else None
-
-                image = read_image_from_url(movie[2])
-                duration = convert_duration_to_minutes(movie[3])
-                views = int(movie[4]) if movie[4].isdigit() else None
-
-                print(
-                    f"Title: {movie[0]} | Description: {description[:20]} | Release year: {release_year} | Genre: {genre} | Duration: {duration} | Views: {views}\n")
-                # Append the movie data to the list
-                list_of_movie_data.append(
-                    (movie[0], image, description, release_year, duration, genre, movie[1], views))
-
-                assert description is not None, "Description is None"
-                assert release_year is not None, "Release year is None"
-                assert genre is not None, "Genre is None"
-                assert image is not None, "Image is None"
-                assert duration is not None, "Duration is None"
-                assert views is not None, "Views is None"
-
-            except Exception as e:
-                logging.info("Element not found extracting description: %s", e)
+def report_stored(scheduler: CrawlScheduler, item: FrontierItem, status: str, stored: bool) -> None:
+    """Mark the deep scraped page as crawled once its movie is stored, or as failed if storing failed.
+       The rate of the host is not changed, a database error is not an error of the host."""
+    scheduler.finish(item, ok=stored, status=status)
+
 
+def deep_scrape(driver: webdriver.Chrome,
+                scheduler: CrawlScheduler) -> Iterator[tuple[str, tuple, Callable[[bool], None]]]:
+    """Scrape particular movie pages taken from the crawl frontier. Yields the site, movie data and a callback
+       the caller invokes with True once the data is stored, which marks the page as crawled."""
+
+    logging.info("Starting deep scraping...")
+    opened_sites: set[str] = set()
+    archive = HtmlArchive() if config["archive"]["enabled"] else None
+
+    for ind, item in enumerate(scheduler, start=1):
+        logging.info("Scraping %s: '%s'", ind, item.url)
+        movie = tuple(item.payload)
+        response_time = 0.0
+        try:
+            # A failed start page is reported with the item and retried before the next page of the site
+            if item.site not in opened_sites:
+                open_site(driver, item.site)
+                opened_sites.add(item.site)
+            start = time.perf_counter()
+            open_page(driver, item.url)
+            response_time = time.perf_counter() - start
+            if item.site == "epika":
+                time.sleep(1)  # Allow the page to load
+                movie_data, complete = scrape_epika_movie(driver, movie)
+            else:
+                time.sleep(2)  # Allow the page to load
+                movie_data, complete = scrape_mediateka_movie(driver, movie, ind)
         except Exception:
             logging.exception("An error occurred while processing '%s'", movie[0])
+            scheduler.report(item, response_time, ok=False)
+            continue
+
+        # Archive is optional, the scraped movie is stored even if its page cannot be archived
+        if archive:
+            try:
+                archive.save(item.site, item.url, driver.page_source)
+            except Exception:
+                logging.exception("Error archiving page '%s'", item.url)
 
-        time.sleep(1)  # Pause between scraping pages
+        # The host served the page, stored pages are marked as crawled, pages failed to store are retried later
+        scheduler.bucket(item.url).record(response_time, ok=True)
+        yield item.site, movie_data, partial(report_stored, scheduler, item, 'done' if complete else 'partial')
 
+    if archive:
+        archive.close()
     logging.info("Deep scraping finished.")
-    return list_of_movie_data
@@ -0,0 +1,7 @@
+# Modules of the app read config.yaml from the working directory, tests run them from the repository root
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
@@ -0,0 +1,73 @@
+import io
+import random
+
+import pytest
+
+from cover_index import BKTree, hamming_distance, similar_covers, duplicate_covers
+from image_processing import cover_hash
+
+
+def signed(value):
+    """Store unsigned 64-bit hash the way SQLite keeps it."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def test_hamming_distance_of_signed_hashes():
+    assert hamming_distance(0, 0b1011) == 3
+    assert hamming_distance(signed((1 << 64) - 1), 0) == 64
+    assert hamming_distance(-1, signed(((1 << 64) - 1) ^ 1)) == 1
+
+
+def test_bk_tree_search_equals_linear_scan():
+    rng = random.Random(1)
+    values = [signed(rng.getrandbits(64)) for _ in range(300)]
+    # Near-duplicates of the first values
+    values += [value ^ (1 << rng.randrange(64)) for value in values[:30]]
+    tree = BKTree()
+    for key, value in enumerate(values):
+        tree.add(value, key)
+    assert tree.size == len(values)
+
+    for query in values[:50]:
+        for max_distance in (0, 3, 10):
+            expected = sorted((hamming_distance(query, value), key) for key, value in enumerate(values)
+                              if hamming_distance(query, value) <= max_distance)
+            assert sorted(tree.search(query, max_distance)) == expected
+
+
+def test_bk_tree_keeps_keys_of_equal_hashes():
+    tree = BKTree()
+    tree.add(5, "a")
+    tree.add(5, "b")
+    assert sorted(tree.search(5, 0)) == [(0, "a"), (0, "b")]
+    assert list(BKTree().search(5, 64)) == []
+
+
+def test_similar_and_duplicate_covers():
+    hashes = {("epika", 1): 0b0000, ("mediateka", 7): 0b0011, ("epika", 2): -1}
+    tree = BKTree()
+    for key, value in hashes.items():
+        tree.add(value, key)
+
+    assert similar_covers(tree, hashes, "epika", 1, 2) == [(2, "mediateka", 7)]
+    assert similar_covers(tree, hashes, "epika", 3, 2) == []
+    assert duplicate_covers(tree, hashes, 2) == [(2, "epika", 1, "mediateka", 7)]
+
+
+def test_cover_hash_is_stable_under_resize_and_recompression():
+    image_module = pytest.importorskip("PIL.Image")
+    image = image_module.linear_gradient("L").resize((320, 480)).rotate(30).convert("RGB")
+
+    def encode(img, image_format, **options):
+        with io.BytesIO() as output:
+            img.save(output, format=image_format, **options)
+            return output.getvalue()
+
+    original = cover_hash(encode(image, "PNG"))
+    smaller = cover_hash(encode(image.resize((160, 240)), "WEBP", quality=60))
+    flipped = cover_hash(encode(image.transpose(image_module.Transpose.FLIP_LEFT_RIGHT), "PNG"))
+    assert -(1 << 63) <= original < 1 << 63
+    assert hamming_distance(original, smaller) <= 6
+    assert hamming_distance(original, flipped) > 6
+    assert cover_hash(None) is None
+    assert cover_hash(b"not an image") is None
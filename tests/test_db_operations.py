@@ -0,0 +1,133 @@
+import sqlite3
+
+import pytest
+
+from db_operations import SCHEMA_VERSION, FULL_SCAN_PATTERN, initialize_database, create_table, explain_query
+
+# Schema objects by the version that added them
+OBJECTS_BY_VERSION = {
+    1: ["original_images"],
+    2: ["idx_movies_url"],
+    3: ["views_history"],
+    4: ["movie_links"],
+    5: ["cover_hashes", "idx_cover_hashes_dhash"],
+    6: ["movie_stats", "movie_stats_insert", "movie_stats_delete", "movie_stats_update"],
+    7: ["movie_changes", "movie_changes_update", "movie_changes_delete"],
+}
+
+MOVIES = [("Tiltas", 1999, 90, "drama", "https://epika.lrt.lt/tiltas"),
+          ("Jūros vėjas", 2005, None, "komedija", "https://www.lrt.lt/mediateka/jura"),
+          ("Be vardo", None, 75, None, "https://www.lrt.lt/mediateka/be-vardo")]
+
+
+def schema_objects(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {name: kind for kind, name in conn.execute("SELECT type, name FROM sqlite_master")}
+    finally:
+        conn.close()
+
+
+def make_database(path, version):
+    """Database of an older schema version holding MOVIES."""
+    if version == 0:
+        # Database of the app before schema versions: only the movies table
+        conn = sqlite3.connect(path)
+        create_table(conn)
+    else:
+        initialize_database(path)
+        conn = sqlite3.connect(path)
+        for added_in, names in OBJECTS_BY_VERSION.items():
+            if added_in > version:
+                for name in names:
+                    kind = schema_objects(path).get(name)
+                    if kind:
+                        conn.execute(f"DROP {kind.upper()} {name}")
+        conn.execute(f"PRAGMA user_version = {version}")
+    conn.executemany("INSERT INTO movies(title, release_year, duration, genre, url) VALUES(?,?,?,?,?)", MOVIES)
+    conn.commit()
+    conn.close()
+
+
+def test_schema_version_matches_migrations():
+    assert SCHEMA_VERSION == max(OBJECTS_BY_VERSION)
+
+
+@pytest.mark.parametrize("version", range(SCHEMA_VERSION))
+def test_upgrade_from_older_version(tmp_path, version):
+    path = str(tmp_path / "movies.db")
+    make_database(path, version)
+
+    initialize_database(path)
+
+    objects = schema_objects(path)
+    for names in OBJECTS_BY_VERSION.values():
+        for name in names:
+            assert name in objects
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute("SELECT count(*) FROM movies").fetchone()[0] == len(MOVIES)
+        # Summaries of movies stored before the upgrade are rebuilt
+        stats = dict(conn.execute("SELECT value, movies FROM movie_stats WHERE dimension = 'genre'"))
+        assert stats == {"drama": 1, "komedija": 1, "unknown": 1}
+        assert conn.execute("SELECT changes FROM movie_changes").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_triggers_keep_stats_and_change_counter(tmp_path):
+    path = str(tmp_path / "movies.db")
+    make_database(path, SCHEMA_VERSION)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute("UPDATE movies SET release_year = 1998 WHERE release_year = 1999")
+            conn.execute("DELETE FROM movies WHERE genre = 'komedija'")
+            conn.execute("UPDATE movies SET date_of_disappearance = '2026-01-01'")  # Not a tracked column
+        decades = dict(conn.execute("SELECT value, movies FROM movie_stats WHERE dimension = 'decade'"))
+        assert decades == {"1990": 1, "unknown": 1}
+        assert conn.execute("SELECT changes FROM movie_changes").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def test_up_to_date_database_is_not_changed(tmp_path):
+    path = str(tmp_path / "movies.db")
+    initialize_database(path)
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE movie_links")
+    conn.commit()
+    conn.close()
+
+    initialize_database(path)
+
+    assert "movie_links" not in schema_objects(path)
+
+
+@pytest.mark.parametrize("step, full_scan", [
+    ("SCAN movies", True),
+    ("SCAN TABLE movies", True),
+    ("SCAN m", True),
+    ("  SCAN h", True),
+    ("SCAN m USING INDEX idx_movies_url", False),
+    ("SCAN movies USING COVERING INDEX idx_movies_url", False),
+    ("SEARCH m USING INTEGER PRIMARY KEY (rowid=?)", False),
+    ("SCAN CONSTANT ROW", False),
+    ("USE TEMP B-TREE FOR ORDER BY", False),
+])
+def test_full_scan_pattern(step, full_scan):
+    assert bool(FULL_SCAN_PATTERN.search(step)) == full_scan
+
+
+def test_explain_query_flags_aliased_full_scan(tmp_path):
+    path = str(tmp_path / "movies.db")
+    initialize_database(path)
+
+    (_, steps, full_scan), = explain_query("SELECT * FROM movies m JOIN movie_links l ON l.movie_id = m.id",
+                                           [path])
+    assert full_scan and steps
+    (_, _, full_scan), = explain_query("SELECT * FROM movies m WHERE m.url = 'x'", [path])
+    assert not full_scan
+    (_, steps, full_scan), = explain_query("SELECT * FROM missing_table", [path])
+    assert not full_scan and steps[0].startswith("Error")
@@ -0,0 +1,118 @@
+import pytest
+
+import frontier
+from frontier import CrawlFrontier, CrawlScheduler, TokenBucket
+
+
+@pytest.fixture
+def crawl_frontier(tmp_path):
+    crawl_frontier = CrawlFrontier(str(tmp_path / "frontier.db"))
+    yield crawl_frontier
+    crawl_frontier.close()
+
+
+def make_bucket(rate=1.0, capacity=1.0):
+    return TokenBucket(rate, capacity, min_rate=0.1, max_rate=2.0, target_response_time=3.0)
+
+
+def test_bucket_halves_rate_on_error_down_to_min_rate():
+    bucket = make_bucket(rate=0.3)
+    bucket.record(0.5, ok=False)
+    assert bucket.rate == pytest.approx(0.15)
+    bucket.record(0.5, ok=False)
+    assert bucket.rate == pytest.approx(0.1)
+
+
+def test_bucket_slows_down_on_slow_response_and_speeds_up_to_max_rate():
+    bucket = make_bucket(rate=1.0)
+    bucket.record(5.0, ok=True)
+    assert bucket.rate == pytest.approx(0.8)
+    for _ in range(20):
+        bucket.record(0.5, ok=True)
+    assert bucket.rate == pytest.approx(2.0)
+
+
+def test_bucket_acquire_waits_for_a_token(monkeypatch):
+    bucket = make_bucket(rate=2.0)
+    sleeps = []
+    monkeypatch.setattr(frontier.time, "sleep", lambda seconds: (sleeps.append(seconds),
+                                                                 setattr(bucket, "tokens", 1)))
+    bucket.acquire()
+    assert sleeps == []
+    bucket.acquire()
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= 0.5
+
+
+def test_add_keeps_known_pages_unless_requeued(crawl_frontier):
+    crawl_frontier.add([("https://epika.lrt.lt/a", ["A"])], "epika", "deep")
+    item = crawl_frontier.lease("epika", "deep")
+    crawl_frontier.complete(item)
+
+    crawl_frontier.add([("https://epika.lrt.lt/a", ["A"])], "epika", "deep")
+    assert crawl_frontier.count("epika", "deep") == 0
+    crawl_frontier.add([("https://epika.lrt.lt/a", ["B"])], "epika", "deep", requeue=True)
+    assert crawl_frontier.lease("epika", "deep").payload == ["B"]
+
+
+def test_lease_takes_highest_priority_and_marks_it_in_progress(crawl_frontier):
+    crawl_frontier.add([("https://epika.lrt.lt/low", None)], "epika", "deep", priority=0)
+    crawl_frontier.add([("https://epika.lrt.lt/high", None)], "epika", "deep", priority=5)
+
+    assert crawl_frontier.lease("epika", "deep").url == "https://epika.lrt.lt/high"
+    assert crawl_frontier.count("epika", "deep", ('in_progress',)) == 1
+    assert crawl_frontier.lease("epika", "deep").url == "https://epika.lrt.lt/low"
+    assert crawl_frontier.lease("epika", "deep") is None
+
+
+def test_fail_backs_off_and_abandons_after_max_attempts(crawl_frontier, monkeypatch):
+    monkeypatch.setitem(frontier.config["crawl"], "max_attempts", 2)
+    crawl_frontier.add([("https://epika.lrt.lt/a", None)], "epika", "deep")
+
+    crawl_frontier.fail(crawl_frontier.lease("epika", "deep"))
+    assert crawl_frontier.count("epika", "deep", ('failed',)) == 1
+    assert crawl_frontier.lease("epika", "deep") is None  # Not eligible before backoff
+    assert crawl_frontier.seconds_until_eligible("epika", "deep") > 0
+
+    crawl_frontier.conn.execute("UPDATE crawl_frontier SET next_eligible_at = 0")
+    crawl_frontier.fail(crawl_frontier.lease("epika", "deep"))
+    assert crawl_frontier.count("epika", "deep", ('abandoned',)) == 1
+    assert crawl_frontier.seconds_until_eligible("epika", "deep") is None
+
+
+def test_pages_left_in_progress_are_released_on_open(tmp_path):
+    path = str(tmp_path / "frontier.db")
+    crawl_frontier = CrawlFrontier(path)
+    crawl_frontier.add([("https://epika.lrt.lt/a", None)], "epika", "deep")
+    crawl_frontier.lease("epika", "deep")
+    crawl_frontier.close()
+
+    crawl_frontier = CrawlFrontier(path)
+    assert crawl_frontier.count("epika", "deep") == 1
+    crawl_frontier.close()
+
+
+def test_scheduler_interleaves_sites(crawl_frontier, monkeypatch):
+    monkeypatch.setattr(TokenBucket, "acquire", lambda self: None)
+    crawl_frontier.add([(f"https://epika.lrt.lt/{i}", None) for i in range(2)], "epika", "deep")
+    crawl_frontier.add([(f"https://www.lrt.lt/{i}", None) for i in range(2)], "mediateka", "deep")
+    scheduler = CrawlScheduler(crawl_frontier, ["epika", "mediateka"], "deep")
+
+    sites = []
+    for item in scheduler:
+        sites.append(item.site)
+        scheduler.report(item, 0.5, ok=True)
+    assert sites == ["epika", "mediateka", "epika", "mediateka"]
+    assert crawl_frontier.count("epika", "deep", ('done',)) == 2
+
+
+def test_finish_does_not_change_rate_of_host(crawl_frontier, monkeypatch):
+    monkeypatch.setattr(TokenBucket, "acquire", lambda self: None)
+    monkeypatch.setitem(frontier.config["crawl"], "max_attempts", 1)
+    crawl_frontier.add([("https://epika.lrt.lt/a", None)], "epika", "deep")
+    scheduler = CrawlScheduler(crawl_frontier, ["epika"], "deep")
+
+    item = scheduler.next_item()
+    rate = scheduler.bucket(item.url).rate
+    scheduler.finish(item, ok=False)
+    assert scheduler.bucket(item.url).rate == rate
+    assert crawl_frontier.count("epika", "deep", ('abandoned',)) == 1
@@ -0,0 +1,47 @@
+from page_parsing import (parse_epika_metadata, parse_mediateka_description, parse_views_count, select_texts,
+                          extract_epika_page, extract_mediateka_page)
+
+
+def test_parse_epika_metadata():
+    assert parse_epika_metadata(["2019", "1h 45m", "Drama", " Komedija "]) == (2019, 105, "Drama, Komedija")
+    assert parse_epika_metadata(["52m"]) == (None, 52, "")
+    assert parse_epika_metadata([]) == (None, None, "")
+
+
+def test_parse_mediateka_description():
+    assert parse_mediateka_description("Lietuviška KOMEDIJA, sukurta 2018 m. Vilniuje") == ("komedija", 2018)
+    assert parse_mediateka_description("Filmas apie 2018 metus") == (None, None)
+
+
+def test_parse_views_count():
+    assert parse_views_count("1234") == 1234
+    assert parse_views_count("None") is None
+    assert parse_views_count("") is None
+
+
+def test_select_texts_with_ancestor_and_class_only_selectors():
+    html = """<div class="meta"><span class="item">2019</span><img src="x"><span class="item">Drama</span></div>
+              <span class="item">outside</span>
+              <section class="text big"><p>First<br>line</p><p>Second</p></section>"""
+    texts = select_texts(html, {"meta": ("div.meta", "span.item"), "paragraphs": (".text", "p")})
+    assert texts == {"meta": ["2019", "Drama"], "paragraphs": ["First line", "Second"]}
+
+
+def test_extract_epika_page():
+    html = """<div class="metadata__product-meta">
+                <span class="metadata__product-meta-element">2001</span>
+                <span class="metadata__product-meta-element">1h 30m</span>
+                <span class="metadata__product-meta-element">Drama</span>
+              </div>
+              <div class="metadata-content__description">Apie <b>filmą</b></div>"""
+    assert extract_epika_page(html) == {"description": "Apie filmą", "release_year": 2001, "duration": 90,
+                                        "genre": "Drama"}
+
+
+def test_extract_mediateka_page_matches_any_tag_like_live_selector():
+    html = """<article class="article-content article-content--sm mt-16 js-text-selection">
+                <p>Komedija, sukurta 1998 m.</p><p>Antra pastraipa</p></article>"""
+    assert extract_mediateka_page(html) == {"description": "Komedija, sukurta 1998 m. Antra pastraipa",
+                                            "release_year": 1998, "genre": "komedija"}
+    assert extract_mediateka_page("<p>No article</p>") == {"description": None, "release_year": None,
+                                                           "genre": None}
@@ -0,0 +1,68 @@
+import zlib
+
+import pytest
+
+from title_matching import (MinHasher, LshIndex, MovieRecord, normalize_text, movie_features, similarity,
+                            find_links)
+
+DESCRIPTION = ("Jaunas mokytojas atvyksta į mažą kaimą prie jūros ir susiduria su senomis paslaptimis, "
+               "kurias vietiniai gyventojai slepia jau daugelį metų")
+
+
+def test_normalize_text_removes_diacritics_years_and_punctuation():
+    assert normalize_text("Žydrasis kaftanas (2018)") == "zydrasis kaftanas"
+    assert normalize_text("Tiltas, 1999 m.!") == "tiltas"
+    assert normalize_text(None) == ""
+
+
+def test_movie_features_of_same_movie_with_different_spelling_are_equal():
+    assert movie_features("Žydrasis kaftanas (2018)", DESCRIPTION, 3) == \
+        movie_features("ZYDRASIS KAFTANAS", DESCRIPTION + ".", 3)
+
+
+@pytest.mark.parametrize("numpy_enabled", [True, False])
+def test_signature_estimates_jaccard_similarity(numpy_enabled):
+    hasher = MinHasher(256, seed=1)
+    if not numpy_enabled:
+        hasher.numpy = None
+    # Features are 32-bit hashes, as produced by movie_features
+    features_1 = {zlib.crc32(f"shingle {i}".encode()) for i in range(100)}
+    features_2 = {zlib.crc32(f"shingle {i}".encode()) for i in range(50, 150)}  # Jaccard similarity 1/3
+    signature_1 = hasher.signature(features_1)
+    assert len(signature_1) == 256
+    assert signature_1 == hasher.signature(set(features_1))
+    assert similarity(signature_1, hasher.signature(features_2)) == pytest.approx(1 / 3, abs=0.1)
+    assert hasher.signature(set()) == ()
+
+
+def test_pure_python_and_numpy_signatures_are_equal():
+    pytest.importorskip("numpy")
+    hasher = MinHasher(64, seed=2)
+    features = {3, 2 ** 32 - 1, 123456789}
+    expected = hasher.signature(features)
+    hasher.numpy = None
+    assert hasher.signature(features) == expected
+
+
+def test_lsh_index_returns_keys_sharing_a_band():
+    index = LshIndex(bands=2, rows=2)
+    index.add(1, (1, 2, 3, 4))
+    index.add(2, (1, 2, 9, 9))
+    index.add(3, (7, 7, 7, 7))
+    assert index.candidates((1, 2, 0, 0)) == {1, 2}
+    assert index.candidates((0, 0, 3, 4)) == {1}
+    assert index.candidates((0, 0, 0, 0)) == set()
+
+
+def record(site, movie_id, title, description):
+    return MovieRecord(site, movie_id, title, f"https://{site}/{movie_id}", movie_features(title, description, 3))
+
+
+def test_find_links_links_only_near_duplicates_across_sites():
+    epika = [record("epika", 1, "Žydrasis kaftanas", DESCRIPTION),
+             record("epika", 2, "Rudens sonata", "Sena pianistė grįžta pas dukterį po ilgų metų tylos ir kalbasi")]
+    mediateka = [record("mediateka", 10, "Zydrasis kaftanas (2018)", DESCRIPTION + " Filmas."),
+                 record("mediateka", 11, "Jūros vėjas", "Žvejai išplaukia į audringą jūrą ieškoti dingusio laivo")]
+    links = find_links(epika, mediateka)
+    assert [(movie.movie_id, other.movie_id) for movie, other, _ in links] == [(1, 10)]
+    assert links[0][2] >= 0.5
@@ -0,0 +1,174 @@
+# Import libraries
+import logging
+import random
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import NamedTuple
+
+# Import functions and classes from other modules of the app
+from db_operations import create_connection
+from metrics import metrics
+from config_loader import Config
+
+# Create a logger
+logger = logging.getLogger(__name__)
+
+# Create an instance of the Config class
+config = Config().settings
+
+# Mersenne prime used by MinHash permutations
+PRIME = (1 << 61) - 1
+
+# Years in titles, e.g. 'Filmas (2018)' or '2018 m.'
+YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}\b(?:\s*m\.)?')
+
+
+class MovieRecord(NamedTuple):
+    """Movie fields used for matching"""
+    site: str
+    movie_id: int
+    title: str
+    url: str
+    features: set[int]
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase the text and remove diacritics, years and punctuation."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    text = YEAR_PATTERN.sub(" ", text)
+    return " ".join(re.sub(r'[\W_]+', ' ', text).split())
+
+
+def movie_features(title: str, description: str, shingle_size: int) -> set[int]:
+    """Hash character trigrams of the title and word shingles of the description to 32-bit integers."""
+    title = normalize_text(title)
+    words = normalize_text(description).split()
+    shingles = {"t:" + title[i:i + 3] for i in range(max(1, len(title) - 2))}
+    shingles.update(" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1))
+    return {zlib.crc32(shingle.encode("utf-8")) for shingle in shingles}
+
+
+class MinHasher:
+    """MinHash signatures built with random linear permutations of 32-bit feature hashes.
+       NumPy is used if it is installed, otherwise signatures are computed in pure Python."""
+
+    def __init__(self, num_perm: int, seed: int):
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        self.numpy = numpy
+        rng = random.Random(seed)
+        # Multipliers below 2**31 keep a * x + b of 32-bit hashes within 64 bits
+        self.permutations = [(rng.randrange(1, 1 << 31), rng.randrange(0, PRIME)) for _ in range(num_perm)]
+        if numpy:
+            self.a = numpy.array([a for a, _ in self.permutations], dtype=numpy.uint64)[:, None]
+            self.b = numpy.array([b for _, b in self.permutations], dtype=numpy.uint64)[:, None]
+
+    def signature(self, features: set[int]) -> tuple[int, ...]:
+        if not features:
+            return ()
+        if self.numpy:
+            values = self.numpy.fromiter(features, dtype=self.numpy.uint64, count=len(features))
+            return tuple(((self.a * values + self.b) % PRIME).min(axis=1).tolist())
+        return tuple(min((a * x + b) % PRIME for x in features) for a, b in self.permutations)
+
+
+def similarity(signature_1: tuple[int, ...], signature_2: tuple[int, ...]) -> float:
+    """Estimate Jaccard similarity of two feature sets from their signatures."""
+    return sum(1 for x, y in zip(signature_1, signature_2) if x == y) / len(signature_1)
+
+
+class LshIndex:
+    """Locality sensitive hashing index: signatures sharing any band become candidate pairs"""
+
+    def __init__(self, bands: int, rows: int):
+        self.bands = bands
+        self.rows = rows
+        self.buckets: list[dict[tuple[int, ...], list[int]]] = [defaultdict(list) for _ in range(bands)]
+
+    def add(self, key: int, signature: tuple[int, ...]) -> None:
+        for band in range(self.bands):
+            self.buckets[band][signature[band * self.rows:(band + 1) * self.rows]].append(key)
+
+    def candidates(self, signature: tuple[int, ...]) -> set[int]:
+        keys = set()
+        for band in range(self.bands):
+            keys.update(self.buckets[band].get(signature[band * self.rows:(band + 1) * self.rows], ()))
+        return keys
+
+
+def load_movies(site: str, shingle_size: int) -> list[MovieRecord]:
+    """Read titles and descriptions of movies of the site."""
+    conn = create_connection(config["data"][site], read_only=True)
+    try:
+        rows = conn.execute("SELECT id, title, description, url FROM movies").fetchall()
+    finally:
+        conn.close()
+    return [MovieRecord(site, movie_id, title, url, movie_features(title, description, shingle_size))
+            for movie_id, title, description, url in rows]
+
+
+def find_links(epika: list[MovieRecord],
+               mediateka: list[MovieRecord]) -> list[tuple[MovieRecord, MovieRecord, float]]:
+    """Find pairs of the same movie on both sites: LSH candidates verified by estimated similarity."""
+    settings = config["matching"]
+    hasher = MinHasher(settings["num_perm"], settings["seed"])
+    rows = settings["num_perm"] // settings["bands"]
+
+    with metrics.timer("minhash_signatures"):
+        epika_signatures = [hasher.signature(movie.features) for movie in epika]
+        mediateka_signatures = [hasher.signature(movie.features) for movie in mediateka]
+
+    # Index one site and look up the other, so only cross-site pairs are compared
+    index = LshIndex(settings["bands"], rows)
+    for key, signature in enumerate(epika_signatures):
+        if signature:
+            index.add(key, signature)
+
+    links = []
+    compared = 0
+    with metrics.timer("lsh_matching"):
+        for movie, signature in zip(mediateka, mediateka_signatures):
+            if not signature:
+                continue
+            for key in index.candidates(signature):
+                compared += 1
+                score = similarity(epika_signatures[key], signature)
+                if score >= settings["threshold"]:
+                    links.append((epika[key], movie, score))
+    logger.info("%s candidate pairs compared, %s links found", compared, len(links))
+    return links
+
+
+def store_links(site: str, links: list[tuple[MovieRecord, MovieRecord, float]]) -> None:
+    """Replace movie links of the site database with the given links to movies of the other site."""
+    linked_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = create_connection(config["data"][site])
+    try:
+        with conn:
+            conn.execute("DELETE FROM movie_links")
+            conn.executemany("INSERT OR REPLACE INTO movie_links(movie_id, linked_site, linked_url, linked_title, "
+                             "score, linked_at) VALUES(?,?,?,?,?,?)",
+                             [(movie.movie_id, other.site, other.url, other.title, round(score, 3), linked_at)
+                              for movie, other, score in links])
+    finally:
+        conn.close()
+
+
+def match_movies() -> None:
+    """Link movies of epika.lrt.lt and lrt.lt/tema/filmai that are near-duplicates of each other."""
+    shingle_size = config["matching"]["shingle_size"]
+    epika = load_movies("epika", shingle_size)
+    mediateka = load_movies("mediateka", shingle_size)
+    logger.info("Matching %s epika movies with %s mediateka movies", len(epika), len(mediateka))
+
+    links = find_links(epika, mediateka)
+    # Links are stored in both databases, as queries run on each database separately
+    store_links("epika", links)
+    store_links("mediateka", [(other, movie, score) for movie, other, score in links])
+    metrics.inc("movie_links", len(links))